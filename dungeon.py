@@ -1,7 +1,12 @@
+import asyncio
 import copy
+import os
+import time
 import uuid
+from contextlib import asynccontextmanager, nullcontext
 from datetime import datetime
-from typing import Dict, List, Optional, Union
+from functools import partial
+from typing import Dict, List, Optional, Tuple, Union
 
 import discord
 from discord.ext import commands
@@ -10,7 +15,56 @@ from loguru import logger as log
 from maki.cogs.utils.config import Config
 from maki.core.bot import Maki
 
-from .lib import FIBONACCI, LEGENDARY_SETS, Guild, Item, Job, Player
+from .lib import (
+    COMBAT_FIELDS,
+    DATABASE_PATH,
+    DEV,
+    FLUSH_INTERVAL,
+    ITEM_EMBED_CACHE_SIZE,
+    LATENCY_BUCKETS,
+    LEGENDARY_SETS,
+    METRICS_INTERVAL,
+    METRICS_PATH,
+    PLAYER_CACHE_SIZE,
+    RAID_HISTORY_LIMIT,
+    RAID_TIMEOUT,
+    RENDER_CACHE_SIZE,
+    SCRUB_BATCH,
+    SCRUB_INTERVAL,
+    SCRUB_SLICE,
+    SIMULATION_MODE,
+    SIMULATION_THRESHOLD,
+    SIMULATION_WORKERS,
+    SLOTS,
+    SLOT_NAMES,
+    STAT_ALIASES,
+    STORAGE_BACKEND,
+    CommandMetrics,
+    EquipmentAggregate,
+    Guild,
+    Issue,
+    Item,
+    Job,
+    KeyedLocks,
+    Leaderboard,
+    LockManager,
+    LRUCache,
+    OwnershipIndex,
+    Player,
+    RaidExecutor,
+    RaidOutcome,
+    RaidState,
+    RenderCache,
+    Scheduler,
+    Scrubber,
+    SQLiteDatabase,
+    WriteBehindStore,
+    check_player,
+    fib_index,
+    migrate_item_templates,
+    migrate_json,
+    render_prometheus,
+)
 from .mixin import _DungeonMixin
 from .utils import equip_view, intword, inventory_view, stamp_footer, stats_view
 
@@ -21,13 +75,60 @@ class Dungeon(commands.Cog, _DungeonMixin):
     def __init__(self, bot):
         self.bot: Maki = bot
         self._lockdown = False  # stops new instances from being created
-        self.user_data = Config("dungeon_users.json", loop=bot.loop)
-        self.user_inventory = Config("dungeon_inventory.json", loop=bot.loop)
-        self.world_data = Config("dungeon_guild.json", loop=bot.loop)
-        self.occupied_guild = {}  # type: dict[int, list(discord.TextChannel.id, int)]
-        # self.char_raid_lock = {}  # type: dict[int, list(discord.TextChannel.id, int)]
+        self.database: Optional[SQLiteDatabase] = None
+        if STORAGE_BACKEND == "sqlite":
+            self.database = SQLiteDatabase(DATABASE_PATH)
+            self.user_data = self.database.store("players")
+            self.user_inventory = self.database.item_store("items")
+            self.world_data = self.database.store("worlds")
+            self.raid_data = self.database.store("raids")
+            migrate_json(
+                self.database,
+                [
+                    (self.user_data, "dungeon_users.json"),
+                    (self.user_inventory, "dungeon_inventory.json"),
+                    (self.world_data, "dungeon_guild.json"),
+                ],
+            )
+        else:
+            self.user_data = Config("dungeon_users.json", loop=bot.loop)
+            self.user_inventory = Config("dungeon_inventory.json", loop=bot.loop)
+            self.world_data = Config("dungeon_guild.json", loop=bot.loop)
+            self.raid_data = Config("dungeon_raids.json", loop=bot.loop)
         self.load_dungeon()
-        # self.auto_check.start()
+        if self.database is not None:
+            migrate_item_templates(self.database, self.user_inventory, self.catalog)
+        # coalesce the several puts a single command does into one write
+        self.user_data = WriteBehindStore(self.user_data, FLUSH_INTERVAL)
+        self.user_inventory = WriteBehindStore(self.user_inventory, FLUSH_INTERVAL)
+        self.world_data = WriteBehindStore(self.world_data, FLUSH_INTERVAL)
+        self.raid_data = WriteBehindStore(self.raid_data, FLUSH_INTERVAL)
+        # identity map, one live Player per user while its record is unchanged
+        self.player_cache = LRUCache(PLAYER_CACHE_SIZE)
+        self.equipment_cache = LRUCache(PLAYER_CACHE_SIZE)
+        self.item_embed_cache = LRUCache(ITEM_EMBED_CACHE_SIZE)
+        self.render_cache = RenderCache(RENDER_CACHE_SIZE)
+        self.metrics = CommandMetrics(LATENCY_BUCKETS)
+        self.leaderboard = Leaderboard(exclude=DEV)
+        self.leaderboard.build(self.user_data.all())
+        self.user_data.listeners.append(self.leaderboard.update)
+        self.ownership = OwnershipIndex()
+        self.ownership.build(self.user_data.all(), self.user_inventory.all())
+        self.user_data.listeners.append(self.ownership.update_player)
+        self.user_inventory.listeners.append(self.ownership.update_inventory)
+        self.raid_executor = RaidExecutor(
+            SIMULATION_MODE, SIMULATION_WORKERS, SIMULATION_THRESHOLD
+        )
+        # guild id / user id -> channel id of the raid, expire on their own
+        self.world_raid_lock = LockManager("world", RAID_TIMEOUT)
+        self.char_raid_lock = LockManager("character", RAID_TIMEOUT)
+        self.user_locks = KeyedLocks("user")
+        self.raids: Dict[int, RaidState] = {}  # guild id -> raid in progress
+        self.scheduler = Scheduler()
+        self.scrubber = Scrubber(
+            SCRUB_BATCH,
+            self.database.get_meta("scrub_cursor", "") if self.database else "",
+        )
 
         # load context menu
         # self.ctx_menu = discord.app_commands.ContextMenu(
@@ -36,37 +137,179 @@ class Dungeon(commands.Cog, _DungeonMixin):
         # )
         # self.bot.tree.add_command(self.ctx_menu)
 
+    @property
+    def stores(self) -> List[WriteBehindStore]:
+        return [self.user_data, self.user_inventory, self.world_data, self.raid_data]
+
+    async def cog_load(self):
+        for store in self.stores:
+            store.start()
+        self.scheduler.start()
+        self.scheduler.schedule("scrub", time.time() + SCRUB_INTERVAL, self.scrub)
+        if METRICS_PATH:
+            self.scheduler.schedule(
+                "metrics", time.time() + METRICS_INTERVAL, self.dump_metrics
+            )
+
     async def cog_unload(self):
-        self.auto_check.cancel()
+        # raids, scrubs and metrics dumps write to the stores, stop them first
+        await self.scheduler.close()
+        self.raid_executor.close()
+        for store in self.stores:
+            await store.close()
+        if self.database is not None:
+            self.database.close()
         await super().cog_unload()
 
-    # @tasks.loop(minutes=10)
-    # async def auto_check(self) -> None:
-    #     """Auto check."""
-    #     log.info("Checking for unremoved locks.")
-    #     removal_list = []
-    #     for k, v in self.world_raid_lock.items():
-    #         if v[1] <= time.time() - 180:
-    #             removal_list.append(k)
-    #     if removal_list:
-    #         log.info("Removed %d world raid locks.", len(removal_list))
-    #         for k in removal_list:
-    #             self.world_raid_lock.pop(k)
-    #     removal_list = []
-    #     for k, v in self.char_raid_lock.items():
-    #         if v[1] <= time.time() - 180:
-    #             removal_list.append(k)
-    #     if removal_list:
-    #         log.info("Removed %d user raid locks.", len(removal_list))
-    #         for k in removal_list:
-    #             self.char_raid_lock.pop(k)
-
     # command functions
     def fib_index(self, n: int) -> int:
-        for i, v in enumerate(FIBONACCI):
-            if v > n:
-                return max(i, 1)
-        return len(FIBONACCI)
+        return fib_index(n)
+
+    def check_in_raid(self, user_id: int) -> bool:
+        """Whether the user joined a raid that has not been settled yet."""
+        return int(user_id) in self.char_raid_lock
+
+    @asynccontextmanager
+    async def lock_users(self, *users: Union[int, discord.User]):
+        """Serialize read-modify-write of these users' records.
+
+        Helpers such as `give_item` or `equip_item` don't lock on their own,
+        the command wraps the whole mutation, re-reading the player inside.
+        If the block raises, the users' cached Players are dropped, they may
+        hold changes that were never saved.
+        """
+        keys = [str(getattr(u, "id", u)) for u in users]
+        async with self.user_locks(*keys):
+            try:
+                yield
+            except BaseException:
+                for key in keys:
+                    self.player_cache.invalidate(key)
+                    self.equipment_cache.invalidate(key)
+                raise
+
+    # instrumentation
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        """Runs before every app command of the cog, starts its latency clock."""
+        interaction.extras["started"] = time.perf_counter()
+        interaction.extras["waited"] = 0.0
+        return True
+
+    async def wait_view(
+        self, interaction: discord.Interaction, view: discord.ui.View
+    ) -> bool:
+        """`view.wait()` kept out of the command latency, which times the bot only."""
+        started = time.perf_counter()
+        try:
+            return await view.wait()
+        finally:
+            waited = time.perf_counter() - started
+            interaction.extras["waited"] = (
+                interaction.extras.get("waited", 0.0) + waited
+            )
+
+    def _observe(self, interaction: discord.Interaction, failed: bool) -> None:
+        started = interaction.extras.pop("started", None)
+        if started is not None and interaction.command is not None:
+            self.metrics.observe(
+                interaction.command.qualified_name,
+                time.perf_counter() - started - interaction.extras.pop("waited", 0.0),
+                failed,
+            )
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(
+        self, interaction: discord.Interaction, command: discord.app_commands.Command
+    ) -> None:
+        self._observe(interaction, False)
+
+    async def cog_app_command_error(
+        self, interaction: discord.Interaction, error: Exception
+    ) -> None:
+        self._observe(interaction, True)
+
+    @property
+    def caches(self) -> Dict[str, Union[LRUCache, RenderCache]]:
+        return {
+            "player": self.player_cache,
+            "equipment": self.equipment_cache,
+            "item_embed": self.item_embed_cache,
+            "render": self.render_cache,
+        }
+
+    def store_stats(self) -> Dict[str, Dict[str, int]]:
+        names = ("players", "inventories", "worlds", "raids")
+        return {name: store.stats() for name, store in zip(names, self.stores)}
+
+    def metrics_text(self) -> str:
+        """Every metric of the cog in the Prometheus text format."""
+        return render_prometheus(
+            self.metrics,
+            self.store_stats(),
+            {name: cache.stats() for name, cache in self.caches.items()},
+        )
+
+    async def dump_metrics(self) -> None:
+        """Write `metrics_text` to METRICS_PATH, then schedule the next dump."""
+        try:
+            text = self.metrics_text()
+            tmp = METRICS_PATH + ".tmp"
+            # replaced in one step so a scraper never reads half a file
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, METRICS_PATH)
+        except OSError as e:
+            log.error("Metrics dump failed: {}", e)
+        finally:
+            self.scheduler.schedule(
+                "metrics", time.time() + METRICS_INTERVAL, self.dump_metrics
+            )
+
+    async def scrub(self) -> None:
+        """Check the next batch of users for drift between the two stores.
+
+        Yields to the event loop every `SCRUB_SLICE` seconds and schedules
+        the next batch when done. Players in a raid are skipped until the
+        next pass. The cursor is saved so a pass survives restarts.
+        """
+        try:
+            batch = self.scrubber.next_batch(self.user_data.all)
+            started = time.perf_counter()
+            for user_id in batch:
+                if time.perf_counter() - started > SCRUB_SLICE:
+                    await asyncio.sleep(0)
+                    started = time.perf_counter()
+                issues = []
+                if not self.check_in_raid(user_id):
+                    async with self.lock_users(user_id):
+                        issues = await self.scrub_user(user_id)
+                self.scrubber.advance(user_id, issues)
+            if self.database is not None:
+                self.database.set_meta("scrub_cursor", self.scrubber.cursor)
+        finally:
+            self.scheduler.schedule("scrub", time.time() + SCRUB_INTERVAL, self.scrub)
+
+    async def scrub_user(self, user_id: str) -> List[Issue]:
+        """Repair one player record against its inventory, callers hold its lock."""
+        player: dict = self.user_data.get(user_id, None)
+        if not isinstance(player, dict):
+            return []
+        fixed, issues = check_player(
+            user_id, player, self.user_inventory.get(user_id, None)
+        )
+        if fixed is not None:
+            await self.user_data.put(user_id, fixed)
+            if any(issue.kind == "broken_slot" for issue in issues):
+                await self.reload_equip_stats(user_id)
+        for issue in issues:
+            log.warning(
+                "Scrubber {} user_id: {} | {}{}",
+                issue.kind,
+                user_id,
+                issue.detail,
+                "" if issue.repaired else " (not repaired)",
+            )
+        return issues
 
     # def stamp_footer(self, e: discord.Embed) -> None:
     #     e.set_footer(text=f"{self.__class__.__name__} version: {self.__version__}")
@@ -108,28 +351,23 @@ class Dungeon(commands.Cog, _DungeonMixin):
     ) -> None:
         """Send stat view."""
         player = await self.get_user(interaction.user)
-        sub_view = stats_view(interaction.user, player.remain_stats)
+        sub_view = stats_view(interaction.user, player.remain_stat)
 
         await interaction.edit_original_response(embed=embed, view=sub_view)
-        result = await sub_view.wait()
+        result = await self.wait_view(interaction, sub_view)
         if sub_view.value == "ret":
             return await self.send_base_view(interaction)
-        elif sub_view.value == "str":
-            player.stats.str += 1
-            player.remain_stats -= 1
-        elif sub_view.value == "dex":
-            player.stats.dex += 1
-            player.remain_stats -= 1
-        elif sub_view.value == "con":
-            player.stats.con += 1
-            player.remain_stats -= 1
-        elif sub_view.value == "wis":
-            player.stats.wis += 1
-            player.remain_stats -= 1
+        elif sub_view.value in STAT_ALIASES:
+            async with self.lock_users(interaction.user):
+                player = await self.get_user(interaction.user)
+                if player.remain_stat > 0:
+                    stat = STAT_ALIASES[sub_view.value]
+                    setattr(player, stat, getattr(player, stat) + 1)
+                    player.remain_stat -= 1
+                    await self.set_user(interaction.user, player)
         elif isinstance(result, bool):
             return await interaction.edit_original_response(embed=embed, view=None)
 
-        await self.set_user(interaction.user, player)
         await self.statsrec_view(
             interaction, await self.user_statsrecord(interaction.user)
         )
@@ -140,7 +378,7 @@ class Dungeon(commands.Cog, _DungeonMixin):
         """Send equip view."""
         sub_view = equip_view(interaction.user)
         await interaction.edit_original_response(embed=embed, view=sub_view)
-        result = await sub_view.wait()
+        result = await self.wait_view(interaction, sub_view)
         if sub_view.value == "ret":
             await self.send_base_view(interaction)
         elif isinstance(result, bool):
@@ -170,151 +408,127 @@ class Dungeon(commands.Cog, _DungeonMixin):
             i += 1
         return result
 
-    async def build_inventory_embeds(
-        self, interaction: discord.Interaction
-    ) -> Dict[str, discord.Embed]:
-        player = await self.get_user(interaction.user)
-        player_inventory: List = player.inventory
-        inventory_embed = {}
-        missing_items = []
-        for it, item_id in enumerate(player_inventory, start=1):
-            item: Item = self.get_user_item(interaction.user, item_id)
-            if item is None:
-                missing_items.append(item_id)
-                continue
-            t = item.name
-            if item.reinforced:
-                t += f" {self.int2Roman(item.reinforced)}"
-
-            if item_id in [
-                player.head,
-                player.necklace,
-                player.body,
-                player.pants,
-                player.gloves,
-                player.boots,
-                player.weapon,
-                player.ring,
-            ]:
-                t += " (已裝備)"
-
-            e = discord.Embed(
-                title=t, description=item.description, colour=player.colour
-            )
-            e.set_author(name=f"物品欄 ({it}/{len(player_inventory)})")
-            category_text = ""
-            if item.category == "head":
-                category_text = "頭部"
-            elif item.category == "necklace":
-                category_text = "項鍊"
-            elif item.category == "body":
-                category_text = "上衣"
-            elif item.category == "pants":
-                category_text = "褲子"
-            elif item.category == "gloves":
-                category_text = "手套"
-            elif item.category == "boots":
-                category_text = "靴子"
-            elif item.category == "weapon":
-                category_text = "武器"
-            elif item.category == "ring":
-                category_text = "戒指"
+    def item_embed(self, item_id: str, item: Item) -> discord.Embed:
+        """Build the embed of one item, without anything owner specific."""
+        e = discord.Embed(
+            title=item.name
+            + (f" {self.int2Roman(item.reinforced)}" if item.reinforced else ""),
+            description=item.description,
+        )
+        e.add_field(
+            name="裝備類別",
+            value=SLOT_NAMES.get(item.category, ""),
+            inline=True,
+        )
+        if item.reinforced:
+            stars = ""
+            rein = item.reinforced
+            stars += ":sparkles:" * int(rein / 10)
+            rein = rein % 10
+            stars += ":star2:" * int(rein / 5)
+            rein = rein % 5
+            stars += ":star:" * rein
             e.add_field(
-                name="裝備類別",
-                value=category_text,
+                name="強化等級",
+                value=stars,
                 inline=True,
             )
-            if item.reinforced:
-                stars = ""
-                rein = item.reinforced
-                stars += ":sparkles:" * int(rein / 10)
-                rein = rein % 10
-                stars += ":star2:" * int(rein / 5)
-                rein = rein % 5
-                stars += ":star:" * rein
-                e.add_field(
-                    name="強化等級",
-                    value=stars,
-                    inline=True,
-                )
-            itemstats = [
+        itemstats = [
+            (
                 (
-                    (
-                        f"蠻力 {item.vit:+}"
-                        + (
-                            f"({item.reinforced_stats.vit:+})\n"
-                            if item.reinforced
-                            else "\n"
-                        )
+                    f"蠻力 {item.vit:+}"
+                    + (
+                        f"({item.reinforced_stats.vit:+})\n"
+                        if item.reinforced
+                        else "\n"
                     )
-                    if item.vit
-                    else ""
-                ),
+                )
+                if item.vit
+                else ""
+            ),
+            (
                 (
-                    (
-                        f"技巧 {item.dex:+}"
-                        + (
-                            f"({item.reinforced_stats.dex:+})\n"
-                            if item.reinforced
-                            else "\n"
-                        )
+                    f"技巧 {item.dex:+}"
+                    + (
+                        f"({item.reinforced_stats.dex:+})\n"
+                        if item.reinforced
+                        else "\n"
                     )
-                    if item.dex
-                    else ""
-                ),
+                )
+                if item.dex
+                else ""
+            ),
+            (
                 (
-                    (
-                        f"體質 {item.sta:+}"
-                        + (
-                            f"({item.reinforced_stats.sta:+})\n"
-                            if item.reinforced
-                            else "\n"
-                        )
+                    f"體質 {item.sta:+}"
+                    + (
+                        f"({item.reinforced_stats.sta:+})\n"
+                        if item.reinforced
+                        else "\n"
                     )
-                    if item.sta
-                    else ""
-                ),
+                )
+                if item.sta
+                else ""
+            ),
+            (
                 (
-                    (
-                        f"神秘 {item.mys:+}"
-                        + (
-                            f"({item.reinforced_stats.mys:+})\n"
-                            if item.reinforced
-                            else "\n"
-                        )
+                    f"神秘 {item.mys:+}"
+                    + (
+                        f"({item.reinforced_stats.mys:+})\n"
+                        if item.reinforced
+                        else "\n"
                     )
-                    if item.mys
-                    else ""
-                ),
-                f"幸運 {item.luk:+}\n" if item.luk else "",
-            ]
-            itemstats = "".join(itemstats)
-            e.add_field(
-                name="屬性加成",
-                value="無" if len(itemstats) == 0 else itemstats,
-                inline=False,
-            )
-            e.set_footer(
-                text=(
-                    "物品代碼:"
-                    f" {item_id}{(f'{chr(10)}包含碎片: {item.reinforce_attempts}') if item.reinforced else ''}"
                 )
+                if item.mys
+                else ""
+            ),
+            f"幸運 {item.luk:+}\n" if item.luk else "",
+        ]
+        itemstats = "".join(itemstats)
+        e.add_field(
+            name="屬性加成",
+            value="無" if len(itemstats) == 0 else itemstats,
+            inline=False,
+        )
+        e.set_footer(
+            text=(
+                "物品代碼:"
+                f" {item_id}{(f'{chr(10)}包含碎片: {item.attempts}') if item.reinforced else ''}"
             )
-            inventory_embed[item_id] = e
-        # fuck this shit
-        if len(missing_items) > 0:
-            for item_id in missing_items:
-                player_inventory.remove(item_id)
-            await self.set_user(interaction.user, player)
-        return inventory_embed
+        )
+        return e
+
+    def inventory_embed(
+        self, user_id: int, player: Player, total: int, item_id: str, index: int
+    ) -> discord.Embed:
+        """Embed of one backpack item, cached per item until its record changes."""
+        record: dict = self.user_inventory.get(user_id, {}).get(item_id, {})
+        e: discord.Embed = self.item_embed_cache.get(item_id, record)
+        if e is None:
+            e = self.item_embed(item_id, self.catalog.load(record))
+            self.item_embed_cache.set(item_id, e, dict(record))
+        e = e.copy()
+        if self.in_player_equips(player, item_id):
+            e.title += " (已裝備)"
+        e.colour = player.colour
+        e.set_author(name=f"物品欄 ({index}/{total})")
+        return e
 
     async def inven_view(
         self,
         interaction: discord.Interaction,
-        embeds: Dict[str, discord.Embed],
+        page: int = 0,
+        selection: Optional[str] = None,
     ):
-        """Send inventory view."""
-        if len(embeds) == 0:
+        """Send inventory view, only the page on screen is rendered."""
+        player = await self.get_user(interaction.user)
+        # ids without a stored item are left to the scrubber
+        item_ids = [
+            item_id
+            for item_id in player.inventory
+            if self.ownership.owns(interaction.user.id, item_id)
+        ]
+        if len(item_ids) == 0:
             await interaction.edit_original_response(
                 embed=discord.Embed(
                     description="你的物品欄是空的", color=discord.Color.red()
@@ -322,20 +536,26 @@ class Dungeon(commands.Cog, _DungeonMixin):
                 view=None,
             )
             return
-        view = inventory_view(interaction.user, embeds)
-        await interaction.edit_original_response(
-            embed=embeds[list(embeds.keys())[0]], view=view
+        view = inventory_view(
+            interaction.user,
+            item_ids,
+            partial(self.inventory_embed, interaction.user.id, player, len(item_ids)),
+            page,
+            selection,
         )
-        result = await view.wait()
+        await interaction.edit_original_response(embed=view.current, view=view)
+        result = await self.wait_view(interaction, view)
         if view.value == "equip":
-            player = await self.get_user(interaction.user)
-            if self.in_player_equips(player, view.selection):
-                await self.unequip_item(interaction.user, view.selection)
-            else:
-                await self.equip_item(interaction.user, view.selection)
+            async with self.lock_users(interaction.user):
+                player = await self.get_user(interaction.user)
+                if self.in_player_equips(player, view.selection):
+                    await self.unequip_item(interaction.user, view.selection)
+                else:
+                    await self.equip_item(interaction.user, view.selection)
 
         elif view.value == "drop":
-            result = await self.remove_item(interaction.user, view.selection)
+            async with self.lock_users(interaction.user):
+                result = await self.remove_item(interaction.user, view.selection)
             if not result:
                 await interaction.followup.send(
                     embed=discord.Embed(
@@ -346,13 +566,14 @@ class Dungeon(commands.Cog, _DungeonMixin):
 
         elif isinstance(result, bool):
             return await interaction.edit_original_response(
-                embed=embeds[view.selection], view=None
+                embed=view.current, view=None
             )
-        inventory_embeds = await self.build_inventory_embeds(interaction)
-        await self.inven_view(interaction, inventory_embeds)
+        await self.inven_view(interaction, view.page, view.selection)
 
     def create_item(self, item_ptr: Item, item_level: int = 1) -> Item:
         """Create item."""
+        if item_ptr.template in self.catalog.templates:
+            return self.catalog.create(item_ptr.template, item_level)
         item = item_ptr.__copy__()
         item.level = item_level
         item.name = f"Lv. {item.level} {item.name}"
@@ -370,73 +591,197 @@ class Dungeon(commands.Cog, _DungeonMixin):
         if not item:
             log.info(f"Item missing, user_id: {user_id} | item: {item_id}")
             return None
-        return Item(data=item)
+        return self.catalog.load(item)
 
     async def reinforce_item(
         self, user: discord.User, item_id: str, rigged=False
     ) -> bool:
         """Reinforce item."""
-        item = self.get_user_item(user, item_id)
-        user_inventory: dict = self.user_inventory.get(user.id, None)
+        item = self.get_user_item(user.id, item_id)
+        user_inventory = dict(self.user_inventory.get(user.id, {}))
 
-        player: Player = await self.get_user(user)
-        player.soulshard -= 1
+        # edited on a copy, the cached Player only changes with the saved record
+        player = Player(data=(await self.get_user(user)).__dict__())
+        equipped = next(
+            (slot for slot in SLOTS if getattr(player, slot) == item_id), None
+        )
+        player.soulstone -= 1
         result = item._reinforce()
         if result is None and not rigged:
-            for parts in [
-                player.head,
-                player.necklace,
-                player.body,
-                player.pants,
-                player.gloves,
-                player.boots,
-                player.weapon,
-                player.ring,
-            ]:
-                if parts == item_id:
-                    parts = ""
-                    break
+            if equipped:
+                setattr(player, equipped, "")
             player.inventory.remove(item_id)
             user_inventory.pop(item_id, None)
             if item.set in LEGENDARY_SETS:
-                player.soulshard += item.reinforce_attempts
-                player.soulshard += 210
+                player.soulstone += item.attempts
+                player.soulstone += 210
             else:
-                player.soulshard += item.reinforce_attempts
+                player.soulstone += item.attempts
         else:
-            item._reinforce_adjustment()
-            user_inventory.update({item_id: item.__dict__()})
-
-        await self.user_inventory.put(user.id, user_inventory)
-        await self.set_user(user, player)
-        await self.reload_equip_stats(user)
+            item._refresh_r_stats()
+            user_inventory[item_id] = item.__dict__()
+
+        record = player.__dict__()
+        if equipped:
+            # only the reinforced slot changed, refresh that one
+            record = self.equip_record(
+                user.id, record, equipped, item if record[equipped] else None
+            )
+        await self.save_user(user.id, record, user_inventory)
         return result
 
     async def give_item(self, user_id: int, item: Item) -> Union[bool, str]:
         """Give an item to a player."""
         item_id = str(uuid.uuid4())
 
-        user_inventory: dict = self.user_inventory.get(user_id, {})
+        user_id = getattr(user_id, "id", user_id)
+        user_inventory = dict(self.user_inventory.get(user_id, {}))
         user_data: dict = self.user_data.get(user_id, None)
 
         if len(user_inventory) >= user_data["allowed_inventory"]:
             return False
 
         user_inventory[item_id] = copy.copy(item.__dict__())
-        await self.user_inventory.put(user_id, user_inventory)
-
-        user_data["inventory"].append(item_id)
-        await self.user_data.put(user_id, user_data)
+        user_data = {**user_data, "inventory": [*user_data["inventory"], item_id]}
+        await self.save_user(user_id, user_data, user_inventory)
 
         return item_id
 
+    async def save_user(self, user_id: int, player: dict, inventory: dict) -> None:
+        """Save a player record and its inventory together in one transaction.
+
+        Callers pass copies, records returned by the stores are never edited
+        in place so memory only changes once the write commits.
+        """
+        with self.database.transaction() if self.database else nullcontext():
+            await self.user_data.put_many({user_id: player})
+            await self.user_inventory.put_many({user_id: inventory})
+
+    async def transfer_items(
+        self, sender_id: int, receiver_id: int, item_ids: List[str]
+    ) -> List[Item]:
+        """Move items from one player to another in one batched write.
+
+        Every item is validated before anything changes, the two players and
+        their inventories are then saved in a single transaction so an item
+        is never lost or duplicated halfway. Items keep their id. Callers
+        hold `lock_users` on both players.
+
+        Raises
+        ------
+        ValueError
+            With the reason shown to the user when the transfer is refused.
+        """
+        sender_id, receiver_id = str(sender_id), str(receiver_id)
+        item_ids = list(dict.fromkeys(item_ids))
+        if not item_ids:
+            raise ValueError("請輸入物品代碼")
+        if sender_id == receiver_id:
+            raise ValueError("物品轉贈失敗，無法轉贈給自己")
+        sender: dict = self.user_data.get(sender_id, None)
+        receiver: dict = self.user_data.get(receiver_id, None)
+        if sender is None or receiver is None:
+            raise ValueError("Player not found")
+
+        sender_inventory = dict(self.user_inventory.get(sender_id, {}))
+        receiver_inventory = dict(self.user_inventory.get(receiver_id, {}))
+        equipped = {sender.get(slot, "") for slot in SLOTS}
+        items: List[Item] = []
+        for item_id in item_ids:
+            if not self.ownership.owns(sender_id, item_id):
+                raise ValueError(f"物品轉贈失敗，請確認物品代碼是否正確: {item_id}")
+            if item_id in equipped:
+                raise ValueError("物品轉贈失敗，裝備目前使用中")
+            item = self.catalog.load(sender_inventory[item_id])
+            if item.set in LEGENDARY_SETS:
+                raise ValueError("物品轉贈失敗，傳說物品無法被轉贈")
+            items.append(item)
+        if len(receiver["inventory"]) + len(item_ids) > receiver["allowed_inventory"]:
+            raise ValueError("物品轉贈失敗，對方物品欄位已滿")
+
+        moved = set(item_ids)
+        for item_id in item_ids:
+            receiver_inventory[item_id] = sender_inventory.pop(item_id)
+        sender = {
+            **sender,
+            "inventory": [i for i in sender["inventory"] if i not in moved],
+        }
+        receiver = {**receiver, "inventory": [*receiver["inventory"], *item_ids]}
+        with self.database.transaction() if self.database else nullcontext():
+            await self.user_data.put_many({sender_id: sender, receiver_id: receiver})
+            await self.user_inventory.put_many(
+                {sender_id: sender_inventory, receiver_id: receiver_inventory}
+            )
+        return items
+
+    async def commit_raid(self, outcome: RaidOutcome) -> Dict[str, Union[bool, str]]:
+        """Persist a finished raid in one batch.
+
+        Participant and world deltas are applied on their latest records and
+        item drops are staged before anything is written, then players,
+        inventories and the world are saved in a single transaction, all while
+        holding the participants' locks so no command can interleave its own
+        write. Memory only reflects the raid once that transaction commits.
+
+        Returns
+        -------
+        Dict[str, Union[bool, str]]
+            Item id given to each drop receiver, False if the backpack was full.
+        """
+        async with self.lock_users(*outcome.players):
+            players: Dict[str, dict] = {}
+            for user_id, delta in outcome.players.items():
+                data: dict = self.user_data.get(user_id, None)
+                if data is None:
+                    log.info(f"Raid participant missing. user_id: {user_id}")
+                    continue
+                player = Player(data=data)
+                delta.apply(player)
+                players[user_id] = player.__dict__()
+
+            inventories: Dict[str, dict] = {}
+            dropped: Dict[str, Union[bool, str]] = {}
+            for user_id, item in outcome.drops:
+                record = players.get(user_id, None)
+                if user_id not in inventories:
+                    inventories[user_id] = dict(self.user_inventory.get(user_id, {}))
+                inventory = inventories[user_id]
+                if record is None or len(inventory) >= record["allowed_inventory"]:
+                    dropped[user_id] = False
+                    continue
+                item_id = str(uuid.uuid4())
+                inventory[item_id] = item.__dict__()
+                record["inventory"] = [*record["inventory"], item_id]
+                dropped[user_id] = item_id
+
+            # read after the locks and the simulation, a `/worldset` made in
+            # the meantime is kept
+            world = Guild(data=self.world_data.get(outcome.guild_id, {}))
+            outcome.world.apply(world)
+
+            with self.database.transaction() if self.database else nullcontext():
+                await self.user_data.put_many(players)
+                await self.user_inventory.put_many(inventories)
+                await self.world_data.put_many({outcome.guild_id: world.__dict__()})
+                if outcome.record is not None:
+                    await self.raid_data.put_many({outcome.raid_id: outcome.record})
+        if len(self.raid_data) > RAID_HISTORY_LIMIT:
+            await self.prune_raids()
+        return dropped
+
+    async def prune_raids(self) -> None:
+        """Drop the oldest replay records, raid ids sort by creation time"""
+        raid_ids = sorted(self.raid_data.all())
+        for raid_id in raid_ids[: len(raid_ids) - RAID_HISTORY_LIMIT]:
+            await self.raid_data.remove(raid_id)
+
     async def give_legendary_item(
         self, user: discord.User, item_name: str, reinforce: int = 0
     ) -> Union[bool, str]:
         """Give a legendary item to a player."""
         item_id = str(uuid.uuid4())
 
-        user_inventory = self.user_inventory.get(user.id, {})
+        user_inventory = dict(self.user_inventory.get(user.id, {}))
         user_data: dict = self.user_data.get(user.id, None)
 
         if len(user_inventory) >= user_data["allowed_inventory"]:
@@ -445,12 +790,10 @@ class Dungeon(commands.Cog, _DungeonMixin):
         item: Item = self.legendary[item_name].__copy__()
         item.name = f"Lv. {item.level} {item.name}"
         item.reinforced = reinforce
-        item._reinforce_adjustment()
+        item._refresh_r_stats()
         user_inventory[item_id] = copy.copy(item.__dict__())
-        await self.user_inventory.put(user.id, user_inventory)
-
-        user_data["inventory"].append(item_id)
-        await self.user_data.put(user.id, user_data)
+        user_data = {**user_data, "inventory": [*user_data["inventory"], item_id]}
+        await self.save_user(user.id, user_data, user_inventory)
 
         return item_id
 
@@ -490,21 +833,27 @@ class Dungeon(commands.Cog, _DungeonMixin):
         :class:`Player`
             The player object.
         """
+        user_id = getattr(user_id, "id", user_id)
+        revision = self.user_data.revision(user_id)
+        player: Player = self.player_cache.get(str(user_id), revision)
+        if player is not None:
+            return player
         data: dict = self.user_data.get(user_id, None)
         if data is not None:
-            return Player(data=data)
+            player = Player(data=data)
+            self.player_cache.set(str(user_id), player, revision)
+            return player
 
         if not create:
             return Player()
 
         # Create a new player in the database.
         player: Player = Player()
-        await self.p_set(user_id, player)
+        await self.set_user(user_id, player)
         item = self.create_item(self.item["wood_stick"], 1)
         item_id = await self.give_item(user_id, item)
         await self.equip_item(user_id, item_id)
-        data: dict = self.user_data.get(user_id, None)
-        return Player(data=data)
+        return await self.get_user(user_id)
 
     async def set_user(self, user_id: int, player: Player) -> None:
         """Save a user's data.
@@ -516,13 +865,42 @@ class Dungeon(commands.Cog, _DungeonMixin):
         - player: :class:`Player`
             The player object to save.
         """
+        user_id = getattr(user_id, "id", user_id)
         await self.user_data.put(user_id, player.__dict__())
+        # the saved object stays the live one for this revision
+        self.player_cache.set(str(user_id), player, self.user_data.revision(user_id))
+
+    async def get_player(self, user: discord.User) -> Player:
+        """Retrieve a user's player, shorthand of `get_user` for user objects."""
+        return await self.get_user(user.id)
+
+    async def set_player(self, user: discord.User, player: Player) -> None:
+        """Save a user's player, shorthand of `set_user` for user objects."""
+        await self.set_user(user.id, player)
+
+    def render_part(
+        self, key: tuple, record: dict, name: str, fields: Tuple[str, ...], build
+    ):
+        """One part of a cached embed, rebuilt once a record field it reads changed."""
+        # copied, lists like the inventory are mutated in place
+        inputs = tuple(copy.copy(record.get(field, None)) for field in fields)
+        return self.render_cache.part(key, name, inputs, build)
 
     async def user_sheet(self, user: discord.User) -> discord.Embed:
         """Get player infosheet in embed."""
         player = await self.get_user(user, False)
-        exp = player.exp
-        required = player.exp_required(player.level)
+        key = ("sheet", user.id)
+        revision = (self.user_data.revision(user.id), user.display_name)
+        payload = self.render_cache.get(key, revision)
+        if payload is None:
+            payload = self._user_sheet(user, player, key)
+            self.render_cache.set(key, revision, payload)
+        e = discord.Embed.from_dict(payload)
+        stamp_footer(self, e)
+        return e
+
+    def _user_sheet(self, user: discord.User, player: Player, key: tuple) -> dict:
+        part = partial(self.render_part, key, self.user_data.get(user.id, None) or {})
         # job = self.job[player.job]
         e = discord.Embed(
             title=f"{user.display_name}",
@@ -531,30 +909,43 @@ class Dungeon(commands.Cog, _DungeonMixin):
         )
         e.set_author(name="角色資訊")
         e.add_field(
-            name="\a",
-            value=(
-                f"物品欄空間: {len(player.inventory)}/{player.allowed_inventory}\n"
-                f"```fix\n生命數值: {player.health:>20,}\n"
-                f"物理傷害:{f'{player._physical_base_damage:,}~{player._physical_max_damage:,}':>20}\n"
-                f"魔法傷害:{f'{player._magical_base_damage:,}~{player._magical_max_damage:,}':>20}\n```"
-            ),
-            inline=False,
+            **part(
+                "overview",
+                ("inventory", "allowed_inventory", *COMBAT_FIELDS),
+                lambda: dict(
+                    name="\a",
+                    value=(
+                        "物品欄空間:"
+                        f" {len(player.inventory)}/{player.allowed_inventory}\n"
+                        f"```fix\n生命數值: {player.health:>20,}\n"
+                        f"物理傷害:{f'{player._physical_base_damage:,}~{player._physical_max_damage:,}':>20}\n"
+                        f"魔法傷害:{f'{player._magical_base_damage:,}~{player._magical_max_damage:,}':>20}\n```"
+                    ),
+                    inline=False,
+                ),
+            )
         )
         e.add_field(
-            name="• 屬性 " + "-" * 40,
-            value=(
-                "```fix\n"
-                f"蠻力: {player.vitality:>20,}\n"
-                f"技巧: {player.dexerity:>20,}\n"
-                f"體質: {player.stamina:>20,}\n"
-                f"神秘: {player.mystic:>20,}\n"
-                "------------------------\n"
-                f"命中: {player.accuracy:>20,}\n"
-                f"速度: {player.speed:>20,}\n"
-                f"回復: {player.regen:>20,}\n"
-                "```"
-            ),
-            inline=False,
+            **part(
+                "attributes",
+                COMBAT_FIELDS,
+                lambda: dict(
+                    name="• 屬性 " + "-" * 40,
+                    value=(
+                        "```fix\n"
+                        f"蠻力: {player.vitality:>20,}\n"
+                        f"技巧: {player.dexterity:>20,}\n"
+                        f"體質: {player.stamina:>20,}\n"
+                        f"神秘: {player.mystic:>20,}\n"
+                        "------------------------\n"
+                        f"命中: {player.accuracy:>20,}\n"
+                        f"速度: {player.speed:>20,}\n"
+                        f"回復: {player.regen:>20,}\n"
+                        "```"
+                    ),
+                    inline=False,
+                ),
+            )
         )
         # e.add_field(
         #     name="• 職業 " + "-" * 12,
@@ -567,13 +958,18 @@ class Dungeon(commands.Cog, _DungeonMixin):
             inline=True,
         )
 
-        prc_str = f"{(exp/required*100):,.2f}%"
-        exp_str = f"{intword(exp)} / {intword(required)}"
-        e.add_field(
-            name="• 經驗 " + "-" * 40,
-            value=f"```fix\n百分比: {prc_str:>20}\n經驗值: {exp_str:>20}\n```",
-            inline=False,
-        )
+        def experience() -> dict:
+            exp = player.exp
+            required = player.exp_required(player.level)
+            prc_str = f"{(exp/required*100):,.2f}%"
+            exp_str = f"{intword(exp)} / {intword(required)}"
+            return dict(
+                name="• 經驗 " + "-" * 40,
+                value=f"```fix\n百分比: {prc_str:>20}\n經驗值: {exp_str:>20}\n```",
+                inline=False,
+            )
+
+        e.add_field(**part("experience", ("level", "exp"), experience))
         if player.blessing:
             blessings = "\n".join(player.blessing)
             e.add_field(
@@ -581,298 +977,191 @@ class Dungeon(commands.Cog, _DungeonMixin):
                 value=f"```fix\n{blessings}\n```",
                 inline=False,
             )
-        if (
-            player.remain_stats
-            or int(player.chest / 20) > 0
-            or len(player.legendary_chest) > 0
-            or player.soulshard > 0
-        ):
+        if player.remain_stat or int(player.chest / 20) > 0 or player.soulstone > 0:
             content_str = ""
-            if player.remain_stats:
-                content_str += f"剩餘點數: {intword(player.remain_stats):>20,}\n"
+            if player.remain_stat:
+                content_str += f"剩餘點數: {intword(player.remain_stat):>20}\n"
             if int(player.chest / 20) > 0:
-                content_str += f"補給木箱: {intword(int(player.chest/20)):>20,}\n"
-            if player.soulshard > 0:
-                content_str += f"靈魂碎片: {intword(player.soulshard):>20,}\n"
+                content_str += f"補給木箱: {intword(int(player.chest/20)):>20}\n"
+            if player.soulstone > 0:
+                content_str += f"靈魂碎片: {intword(player.soulstone):>20}\n"
             e.add_field(
                 name="• 提醒 " + "-" * 40,
                 value=f"```fix\n{content_str}\n```",
                 inline=False,
             )
-        stamp_footer(e)
-        return e
+        return e.to_dict()
 
     async def user_statsrecord(self, user: discord.User) -> discord.Embed:
         """Get player stats and raid record"""
         player: Player = await self.get_user(user)
+        key = ("statsrecord", user.id)
+        revision = (self.user_data.revision(user.id), str(user))
+        payload = self.render_cache.get(key, revision)
+        if payload is None:
+            payload = self._user_statsrecord(user, player, key)
+            self.render_cache.set(key, revision, payload)
+        e = discord.Embed.from_dict(payload)
+        stamp_footer(self, e)
+        return e
+
+    def _user_statsrecord(self, user: discord.User, player: Player, key: tuple) -> dict:
+        part = partial(self.render_part, key, self.user_data.get(user.id, None) or {})
         e = discord.Embed(
             title=f"{user.name}#{user.discriminator}",
-            description=f"**剩餘點數: {player.remain_stats:,}**",
+            description=f"**剩餘點數: {player.remain_stat:,}**",
             colour=player.colour,
         )
         e.set_author(name="角色屬性&討伐紀錄")
         e.add_field(
-            name="• 角色屬性",
-            value=(
-                "```st\n蠻力:"
-                f" {player._vitality:>5,}{'' if not any([player.equip_stats.vit]) else f'({player.vit:,}{player.equip_stats.str:+,})'}\n技巧:"
-                f" {player._dexterity:>5,}{'' if not any([player.equip_stats.dex]) else f'({player.dex:,}{player.equip_stats.dex:+,})'}\n體質:"
-                f" {player._stamina:>5,}{'' if not any([player.equip_stats.sta]) else f'({player.sta:,}{player.equip_stats.con:+,})'}\n神秘:"
-                f" {player._mystic:>5,}{'' if not any([player.equip_stats.mys]) else f'({player.mys:,}{player.equip_stats.wis:+,})'}\n------------------------\n物理傷害:{f'{player._physical_base_damage:,}~{player._physical_max_damage:,}':>20}\n魔法傷害:{f'{player._magical_base_damage:,}~{player._magical_max_damage:,}':>20}\n```命中:"
-                f" {player.accuracy:>20,}\n回復: {player.regen:>20,}\n速度:"
-                f" {player.speed:>20,}\n```"
-            ),
-            inline=False,
+            **part(
+                "attributes",
+                COMBAT_FIELDS,
+                lambda: dict(
+                    name="• 角色屬性",
+                    value=(
+                        "```st\n蠻力:"
+                        f" {player._vitality:>5,}{'' if not any([player.equip_stats.vit]) else f'({player.vit:,}{player.equip_stats.vit:+,})'}\n技巧:"
+                        f" {player._dexterity:>5,}{'' if not any([player.equip_stats.dex]) else f'({player.dex:,}{player.equip_stats.dex:+,})'}\n體質:"
+                        f" {player._stamina:>5,}{'' if not any([player.equip_stats.sta]) else f'({player.sta:,}{player.equip_stats.sta:+,})'}\n神秘:"
+                        f" {player._mystic:>5,}{'' if not any([player.equip_stats.mys]) else f'({player.mys:,}{player.equip_stats.mys:+,})'}\n------------------------\n物理傷害:{f'{player._physical_base_damage:,}~{player._physical_max_damage:,}':>20}\n魔法傷害:{f'{player._magical_base_damage:,}~{player._magical_max_damage:,}':>20}\n```命中:"
+                        f" {player.accuracy:>20,}\n回復: {player.regen:>20,}\n速度:"
+                        f" {player.speed:>20,}\n```"
+                    ),
+                    inline=False,
+                ),
+            )
         )
         e.add_field(
-            name="• 討伐紀錄",
-            value=(
-                "```st\n"
-                f"討伐怪物: {player.monster_cnt:,}\n"
-                f"最高輸出: {player.max_dmg:,}\n"
-                f"總輸出: {player.cum_dmg:,}\n"
-                "```"
-            ),
-            inline=False,
+            **part(
+                "record",
+                ("monster_cnt", "max_dmg", "cum_dmg"),
+                lambda: dict(
+                    name="• 討伐紀錄",
+                    value=(
+                        "```st\n"
+                        f"討伐怪物: {player.monster_cnt:,}\n"
+                        f"最高輸出: {player.max_dmg:,}\n"
+                        f"總輸出: {player.cum_dmg:,}\n"
+                        "```"
+                    ),
+                    inline=False,
+                ),
+            )
         )
-        stamp_footer(e)
-        return e
+        return e.to_dict()
 
     async def user_equipments(self, user: discord.User) -> discord.Embed:
         """Get player raid record."""
         player: Player = await self.get_user(user)
+        key = ("equipments", user.id)
+        revision = (
+            self.user_data.revision(user.id),
+            self.user_inventory.revision(user.id),
+            str(user),
+        )
+        payload = self.render_cache.get(key, revision)
+        if payload is None:
+            payload = self._user_equipments(user, player, key)
+            self.render_cache.set(key, revision, payload)
+        e = discord.Embed.from_dict(payload)
+        stamp_footer(self, e)
+        return e
+
+    def _user_equipments(self, user: discord.User, player: Player, key: tuple) -> dict:
+        inventory: dict = self.user_inventory.get(user.id, None) or {}
         e = discord.Embed(
             title=f"{user.name}#{user.discriminator}",
             description=player.status,
             colour=player.colour,
         )
         e.set_author(name="角色配戴裝備欄位")
-        if player.head:
-            item = self.get_user_item(user, player.head)
-            item_name = f"{item.name} {self.int2Roman(item.reinforced)}"
-            e.add_field(
-                name="▹ 頭部",
-                value="\n".join(["```st", item_name, "```"]),
-                inline=False,
-            )
-        if player.necklace:
-            item = self.get_user_item(user, player.necklace)
-            item_name = f"{item.name} {self.int2Roman(item.reinforced)}"
-            e.add_field(
-                name="▹ 項鍊",
-                value="\n".join(["```st", item_name, "```"]),
-                inline=False,
-            )
-        if player.body:
-            item = self.get_user_item(user, player.body)
-            item_name = f"{item.name} {self.int2Roman(item.reinforced)}"
-            e.add_field(
-                name="▹ 上衣",
-                value="\n".join(["```st", item_name, "```"]),
-                inline=False,
-            )
-        if player.pants:
-            item = self.get_user_item(user, player.pants)
-            item_name = f"{item.name} {self.int2Roman(item.reinforced)}"
-            e.add_field(
-                name="▹ 褲子",
-                value="\n".join(["```st", item_name, "```"]),
-                inline=False,
-            )
-        if player.gloves:
-            item = self.get_user_item(user, player.gloves)
-            item_name = f"{item.name} {self.int2Roman(item.reinforced)}"
-            e.add_field(
-                name="▹ 手套",
-                value="\n".join(["```st", item_name, "```"]),
-                inline=False,
-            )
-        if player.boots:
-            item = self.get_user_item(user, player.boots)
-            item_name = f"{item.name} {self.int2Roman(item.reinforced)}"
-            e.add_field(
-                name="▹ 靴子",
-                value="\n".join(["```st", item_name, "```"]),
-                inline=False,
-            )
-        if player.weapon:
-            item = self.get_user_item(user, player.weapon)
-            item_name = f"{item.name} {self.int2Roman(item.reinforced)}"
-            e.add_field(
-                name="▹ 武器",
-                value="\n".join(["```st", item_name, "```"]),
-                inline=False,
-            )
-        if player.ring:
-            item = self.get_user_item(user, player.ring)
-            item_name = f"{item.name} {self.int2Roman(item.reinforced)}"
-            e.add_field(
-                name="▹ 戒指",
-                value="\n".join(["```st", item_name, "```"]),
-                inline=False,
-            )
+        for slot, slot_name in SLOT_NAMES.items():
+            item_id = getattr(player, slot)
+            if not item_id:
+                continue
 
-        stamp_footer(e)
-        return e
+            def field(item_id: str = item_id, slot_name: str = slot_name) -> dict:
+                item = self.get_user_item(user.id, item_id)
+                item_name = f"{item.name} {self.int2Roman(item.reinforced)}"
+                return dict(
+                    name=f"▹ {slot_name}",
+                    value="\n".join(["```st", item_name, "```"]),
+                    inline=False,
+                )
+
+            inputs = (item_id, inventory.get(item_id, None))
+            e.add_field(**self.render_cache.part(key, slot, inputs, field))
+        return e.to_dict()
+
+    def equipment(self, user_id: int, player: dict) -> EquipmentAggregate:
+        """Get the maintained equipment aggregate, built once per cached user."""
+        aggregate: EquipmentAggregate = self.equipment_cache.get(str(user_id))
+        if aggregate is None:
+            aggregate = EquipmentAggregate()
+            for slot in SLOTS:
+                if player.get(slot):
+                    item = self.get_user_item(user_id, player[slot])
+                    aggregate.set_slot(slot, player[slot], item)
+            self.equipment_cache.set(str(user_id), aggregate)
+        return aggregate
+
+    def equip_record(
+        self, user_id: int, player: dict, slot: str, item: Optional[Item] = None
+    ) -> dict:
+        """Copy of player with equip stats refreshed after one slot changed.
+
+        item is what the slot now holds, read from the inventory if omitted.
+        """
+        aggregate = self.equipment(user_id, player)
+        item_id = player.get(slot, "")
+        if item is None and item_id:
+            item = self.get_user_item(user_id, item_id)
+        aggregate.set_slot(slot, item_id, item)
+        equip_stats, blessing = aggregate.totals()
+        return {**player, "equip_stats": equip_stats.__dict__(), "blessing": blessing}
+
+    async def update_equip_slot(self, user_id: int, player: dict, slot: str) -> None:
+        """Refresh equip stats after one slot of player changed and save it."""
+        await self.user_data.put(user_id, self.equip_record(user_id, player, slot))
 
     async def reload_equip_stats(self, user_id: int):
-        """Reload player equipment stats"""
+        """Rebuild player equipment stats from every equipped item"""
         player: dict = self.user_data.get(user_id, None)
         if not player:
             raise ValueError("Player not found")
-        equipped = [
-            player["head"],
-            player["necklace"],
-            player["body"],
-            player["pants"],
-            player["gloves"],
-            player["boots"],
-            player["weapon"],
-            player["ring"],
-        ]
-        player["equip_stats"]["str"] = 0
-        player["equip_stats"]["dex"] = 0
-        player["equip_stats"]["con"] = 0
-        player["equip_stats"]["wis"] = 0
-        player["equip_stats"]["luk"] = 0
-        player["range_adjustment"] = 0
-
-        Behemoth = 0
-        Leviathan = 0
-        Tiamat = 0
-
-        for item_id in equipped:
-            if not item_id:
-                continue
-            item = self.get_user_item(user_id, item_id)
-            if item is None:
-                continue
-            player["equip_stats"]["str"] += item.str
-            player["equip_stats"]["str"] += item.reinforced_stats.str
-            player["equip_stats"]["dex"] += item.dex
-            player["equip_stats"]["dex"] += item.reinforced_stats.dex
-            player["equip_stats"]["con"] += item.con
-            player["equip_stats"]["con"] += item.reinforced_stats.con
-            player["equip_stats"]["wis"] += item.wis
-            player["equip_stats"]["wis"] += item.reinforced_stats.wis
-            player["equip_stats"]["luk"] += item.luk
-            player["range_adjustment"] += item.range_adjustment
-
-            if item.set == "Behemoth":
-                Behemoth += 1
-            if item.set == "Leviathan":
-                Leviathan += 1
-            if item.set == "Tiamat":
-                Tiamat += 1
-
-        blessing = []
-        if Behemoth >= 3:
-            player["equip_stats"]["str"] += 200
-            player["equip_stats"]["str"] = int(player["equip_stats"]["str"] * 1.6)
-            bless = "I"
-            if Behemoth >= 6:
-                player["equip_stats"]["dex"] += 300
-                bless = "II"
-                if Behemoth >= 8:
-                    player["equip_stats"]["dex"] = int(
-                        player["equip_stats"]["dex"] * 2.5
-                    )
-                    bless = "III"
-            blessing.append("貝西摩斯的猖狂 " + bless)
-        if Leviathan >= 3:
-            player["equip_stats"]["con"] += 200
-            player["equip_stats"]["con"] = int(player["equip_stats"]["con"] * 1.1)
-            bless = "I"
-            if Leviathan >= 6:
-                player["equip_stats"]["wis"] += 300
-                bless = "II"
-                if Leviathan >= 8:
-                    player["equip_stats"]["wis"] = int(
-                        player["equip_stats"]["wis"] * 2.1
-                    )
-                    bless = "III"
-            blessing.append("利維坦的傲慢 " + bless)
-        if Tiamat >= 3:
-            player["equip_stats"]["str"] += 200
-            player["equip_stats"]["str"] = int(player["equip_stats"]["str"] * 1.9)
-            bless = "I"
-            if Tiamat >= 6:
-                player["equip_stats"]["con"] += 300
-                bless = "II"
-                if Tiamat >= 8:
-                    player["equip_stats"]["con"] = int(
-                        player["equip_stats"]["con"] * 1.9
-                    )
-                    bless = "III"
-            blessing.append("提亞馬特的狂妄 " + bless)
-
-        player["blessing"] = blessing
-
+        self.equipment_cache.invalidate(str(user_id))
+        aggregate = self.equipment(user_id, player)
+        equip_stats, blessing = aggregate.totals()
+        player = {**player, "equip_stats": equip_stats.__dict__(), "blessing": blessing}
         return await self.user_data.put(user_id, player)
 
     async def equip_item(self, user_id: int, item_id: str):
+        user_id = getattr(user_id, "id", user_id)
         player: dict = self.user_data.get(user_id, None)
         if not player:
             raise ValueError("Player not found")
-        if item_id in [
-            player["head"],
-            player["necklace"],
-            player["body"],
-            player["pants"],
-            player["gloves"],
-            player["boots"],
-            player["weapon"],
-            player["ring"],
-        ]:
+        if item_id in [player.get(slot, "") for slot in SLOTS]:
             return
         item = self.get_user_item(user_id, item_id)
-        if item.level > player["level"] + max(player["rebirth"], 10):
-            return
         if not item:
             raise ValueError("Item not found")
-        if item.category == "head":
-            slot = "head"
-        elif item.category == "necklace":
-            slot = "necklace"
-        elif item.category == "body":
-            slot = "body"
-        elif item.category == "pants":
-            slot = "pants"
-        elif item.category == "gloves":
-            slot = "gloves"
-        elif item.category == "boots":
-            slot = "boots"
-        elif item.category == "weapon":
-            slot = "weapon"
-        elif item.category == "ring":
-            slot = "ring"
-        else:
+        if item.level > player["level"] + max(player.get("rebirth", 0), 10):
+            return
+        if item.category not in SLOTS:
             raise ValueError("Invalid item category")
-        player[slot] = item_id
-        await self.user_data.put(user_id, player)
-        await self.reload_equip_stats(user_id)
+        player = {**player, item.category: item_id}
+        await self.update_equip_slot(user_id, player, item.category)
 
     async def unequip_item(self, user: discord.User, item_id: str):
         player: dict = self.user_data.get(user.id, None)
         if not player:
             raise ValueError("Player not found")
-        for part in [
-            "head",
-            "necklace",
-            "body",
-            "pants",
-            "gloves",
-            "boots",
-            "weapon",
-            "ring",
-        ]:
-            if item_id == player[part]:
-                player[part] = ""
+        for part in SLOTS:
+            if item_id == player.get(part, ""):
+                await self.update_equip_slot(user.id, {**player, part: ""}, part)
                 break
 
-        await self.user_data.put(user.id, player)
-        await self.reload_equip_stats(user)
-
     def in_player_equips(self, player: Player, item_id: str):
         return item_id in [
             player.head,
@@ -891,15 +1180,14 @@ class Dungeon(commands.Cog, _DungeonMixin):
             return False
         if not player:
             raise ValueError("Player not found")
-        item = self.get_user_item(user, item_id)
+        item = self.get_user_item(user.id, item_id)
         if not item:
             raise ValueError("Item not found")
+        player = Player(data=player.__dict__())
         player.inventory.remove(item_id)
-        await self.set_user(user, player)
-
-        user_inventory = self.user_inventory.get(user.id, None)
+        user_inventory = dict(self.user_inventory.get(user.id, {}))
         user_inventory.pop(item_id, None)
-        await self.user_inventory.put(user.id, user_inventory)
+        await self.save_user(user.id, player.__dict__(), user_inventory)
         return True
 
     # world related functions
@@ -921,6 +1209,25 @@ class Dungeon(commands.Cog, _DungeonMixin):
     async def world_info(self, guild: discord.Guild) -> discord.Embed:
         """Get world info."""
         world = await self.get_world(guild)
+        key = ("world", guild.id)
+        revision = (
+            self.world_data.revision(guild.id),
+            guild.name,
+            guild.icon.key if guild.icon else None,
+            guild.premium_subscription_count,
+            guild.premium_tier,
+            str(guild.owner),
+        )
+        payload = self.render_cache.get(key, revision)
+        if payload is None:
+            payload = self._world_info(guild, world, key)
+            self.render_cache.set(key, revision, payload)
+        e = discord.Embed.from_dict(payload)
+        stamp_footer(self, e)
+        return e
+
+    def _world_info(self, guild: discord.Guild, world: Guild, key: tuple) -> dict:
+        part = partial(self.render_part, key, self.world_data.get(guild.id, None) or {})
         e = discord.Embed(
             title=f"{guild.name}",
             description=world.status,
@@ -949,29 +1256,38 @@ class Dungeon(commands.Cog, _DungeonMixin):
             inline=True,
         )
         e.add_field(
-            name="• 世界數據",
-            value=(
-                "```asciidoc\n"
-                f"- 擊殺首領: {world.killed_bosses:>40,}\n"
-                f"- 擊殺怪物: {world.killed_mobs:>40,}\n"
-                "```"
-            ),
-            inline=False,
-        )
-        required = world.exp_required(world.level)
-        prc_str = f"{(world.exp/required*100):,.2f}%"
-        exp_str = f"{world.exp:,} / {required:,}"
-        nxt_str = f"{required - world.exp:,}"
-        e.add_field(
-            name="• 世界經驗值",
-            value=(
-                "```asciidoc\n"
-                f"- 百分比: {prc_str:>40}\n"
-                f"- 經驗值: {exp_str:>40}\n"
-                f"- 離升等: {nxt_str:>40}\n"
-                "```"
-            ),
-            inline=False,
+            **part(
+                "record",
+                ("killed_bosses", "killed_mobs", "monster_cnt"),
+                lambda: dict(
+                    name="• 世界數據",
+                    value=(
+                        "```asciidoc\n"
+                        f"- 擊殺首領: {world.killed_bosses:>40,}\n"
+                        f"- 擊殺怪物: {world.killed_mobs:>40,}\n"
+                        "```"
+                    ),
+                    inline=False,
+                ),
+            )
         )
-        stamp_footer(e)
-        return e
+
+        def experience() -> dict:
+            required = world.exp_required(world.level)
+            prc_str = f"{(world.exp/required*100):,.2f}%"
+            exp_str = f"{world.exp:,} / {required:,}"
+            nxt_str = f"{required - world.exp:,}"
+            return dict(
+                name="• 世界經驗值",
+                value=(
+                    "```asciidoc\n"
+                    f"- 百分比: {prc_str:>40}\n"
+                    f"- 經驗值: {exp_str:>40}\n"
+                    f"- 離升等: {nxt_str:>40}\n"
+                    "```"
+                ),
+                inline=False,
+            )
+
+        e.add_field(**part("experience", ("level", "exp"), experience))
+        return e.to_dict()
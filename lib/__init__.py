@@ -2,17 +2,72 @@
 # flake8: noqa
 
 from .base import Job, MonsterInfo, Stats
+from .cache import LRUCache, RenderCache
+from .combat import (
+    CombatResult,
+    RaidExecutor,
+    record_raid,
+    replay,
+    restore,
+    simulate_raid,
+    simulate_snapshot,
+    snapshot,
+)
+from .combatlog import CombatEvent, CombatLog, EventKind, pack_log, render_events
 from .constant import (
     CHARACTER_LEVEL_LIMIT,
+    COMBAT_LOG_CAP,
+    COMBAT_LOG_GZIP,
+    DATABASE_PATH,
     DEV,
     EXP_MULTIPLIER,
     FIBONACCI,
+    FLUSH_INTERVAL,
+    ITEM_EMBED_CACHE_SIZE,
+    LATENCY_BUCKETS,
     LEGENDARY_SETS,
+    METRICS_INTERVAL,
+    METRICS_PATH,
+    PLAYER_CACHE_SIZE,
+    RAID_HISTORY_LIMIT,
+    RAID_TIMEOUT,
+    RENDER_CACHE_SIZE,
+    SCRUB_BATCH,
+    SCRUB_INTERVAL,
+    SCRUB_SLICE,
+    SIMULATION_MODE,
+    SIMULATION_THRESHOLD,
+    SIMULATION_WORKERS,
+    STORAGE_BACKEND,
     WORLD_LEVEL_LIMIT,
 )
 from .entity import Entity
+from .equipment import SLOT_NAMES, SLOTS, EquipmentAggregate
 from .guild import Guild
 from .instance import InstanceHandler
-from .item import Item
-from .monster import Monster
-from .player import Player
+from .item import Item, ItemCatalog
+from .leaderboard import Leaderboard
+from .locks import KeyedLocks, Lease, LockManager
+from .metrics import CommandMetrics, Histogram, format_table, render_prometheus
+from .monster import Monster, MonsterPrototype, prototype, roll_points
+from .outcome import PlayerDelta, RaidOutcome, WorldDelta
+from .ownership import ItemOwner, OwnershipIndex
+from .player import COMBAT_FIELDS, STAT_ALIASES, Player
+from .progression import (
+    PLAYER_EXP,
+    WORLD_EXP,
+    fib_index,
+    player_exp_required,
+    resolve_levels,
+    world_exp_required,
+)
+from .repository import WriteBehindStore
+from .scheduler import RaidPhase, RaidState, Scheduler
+from .scrubber import Issue, Scrubber, check_player
+from .storage import (
+    SQLiteDatabase,
+    SQLiteItemStore,
+    SQLiteStore,
+    migrate_item_templates,
+    migrate_json,
+)
@@ -0,0 +1,135 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Bounded LRU map where every entry is tagged with a revision
+
+    A lookup with a different revision than the stored one counts as a miss
+    and drops the stale entry, so callers never see outdated objects.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Tuple[Any, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, revision: Any = None) -> Optional[Any]:
+        entry = self._data.get(key, None)
+        if entry is None or entry[0] != revision:
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, revision: Any = None) -> None:
+        self._data[key] = (revision, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hit_ratio, 4),
+        }
+
+
+class RenderCache:
+    """
+    Rendered embed payloads kept per owner
+
+    `get` returns the stored payload while the owner's revision is unchanged.
+    When it changed the embed is rebuilt, but every part built through `part`
+    is reused while its own inputs compare equal, so only the fields whose
+    inputs changed are formatted again.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        # key -> [revision, payload, {part name: (inputs, value)}]
+        self._entries = LRUCache(maxsize)
+        self.hits = 0
+        self.misses = 0
+        self.part_hits = 0
+        self.part_misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _entry(self, key: Hashable) -> list:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = [None, None, {}]
+            self._entries.set(key, entry)
+        return entry
+
+    def get(self, key: Hashable, revision: Any) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] is None or entry[0] != revision:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, revision: Any, payload: dict) -> None:
+        entry = self._entry(key)
+        entry[0], entry[1] = revision, payload
+
+    def part(
+        self, key: Hashable, name: str, inputs: Any, build: Callable[[], Any]
+    ) -> Any:
+        """Value of one part of the embed, rebuilt only when its inputs changed"""
+        parts = self._entry(key)[2]
+        cached = parts.get(name, None)
+        if cached is not None and cached[0] == inputs:
+            self.part_hits += 1
+            return cached[1]
+        self.part_misses += 1
+        value = build()
+        parts[name] = (inputs, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.invalidate(key)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        parts = self.part_hits + self.part_misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self._entries.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total if total else 0.0, 4),
+            "part_hits": self.part_hits,
+            "part_misses": self.part_misses,
+            "part_hit_ratio": round(self.part_hits / parts if parts else 0.0, 4),
+        }
@@ -0,0 +1,530 @@
+import asyncio
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .base import Stats
+from .combatlog import CombatEvent, EventKind, render_events
+from .constant import COMBAT_LOG_CAP, FIBONACCI
+from .entity import Entity
+from .monster import Monster
+from .progression import fib_index
+
+
+@dataclass
+class CombatResult:
+    """Outcome of a simulated raid, free of any discord objects."""
+
+    won: bool
+    rounds: int
+    killer: Optional[str]
+    monster_health: int
+    monster_max_health: int
+    health: Dict[str, int] = field(default_factory=dict)  # remaining health
+    damage: Dict[str, List[int]] = field(default_factory=dict)  # every hit dealt
+    monster_name: str = ""
+    events: List[CombatEvent] = field(default_factory=list)
+
+    @property
+    def total_damage(self) -> int:
+        return sum(sum(v) for v in self.damage.values())
+
+    def top_damage(self, limit: int = 10) -> Dict[str, List[int]]:
+        """Participants sorted by damage dealt, only those who dealt any"""
+        ranked = sorted(
+            ((k, v) for k, v in self.damage.items() if sum(v) > 0),
+            key=lambda x: sum(x[1]),
+            reverse=True,
+        )
+        return dict(ranked[:limit])
+
+    def render_log(self, names: Dict[str, str], cap: int = COMBAT_LOG_CAP) -> str:
+        """Readable combat log, only built when someone asks for it"""
+        return render_events(self.events, names, self.monster_name, cap)
+
+
+def simulate_raid(
+    participants: Dict[str, Entity],
+    names: Dict[str, str],
+    monster: Monster,
+    seed: Optional[int] = None,
+) -> CombatResult:
+    """
+    Run the whole raid combat without touching discord or storage
+
+    Parameters
+    ----------
+    participants: Dict[str, Entity] - user id to combat entity
+    names: Dict[str, str] - user id to display name, used in the combat log
+    monster: Monster - monster to fight, its mods are restored afterwards
+    seed: Optional[int] - seed for every roll, same seed same raid
+    """
+    mods = (monster.vit_mod, monster.dex_mod, monster.sta_mod, monster.mys_mod)
+    try:
+        return _simulate(participants, names, monster, random.Random(seed))
+    finally:
+        monster.vit_mod, monster.dex_mod, monster.sta_mod, monster.mys_mod = mods
+
+
+# fields the engine reads and the value `Entity` defaults to when missing
+_SNAPSHOT_FIELDS = {
+    "vit": 3,
+    "dex": 3,
+    "sta": 3,
+    "mys": 3,
+    "luk": 5,
+    "vit_mod": 1.0,
+    "dex_mod": 1.0,
+    "sta_mod": 1.0,
+    "mys_mod": 1.0,
+    "luk_mod": 1.0,
+    "speed": 75,
+    "level": 1,
+}
+_SNAPSHOT_EXTRAS = ("health", "remain_stat", "job", "name", "elite")
+
+
+def snapshot(entity: Entity) -> Dict[str, Any]:
+    """
+    Plain picklable copy of everything the combat engine reads from entity
+
+    Fields still at their default value are left out to keep stored replay
+    records small.
+    """
+    data = {
+        k: getattr(entity, k)
+        for k, default in _SNAPSHOT_FIELDS.items()
+        if getattr(entity, k) != default
+    }
+    data.update({k: getattr(entity, k) for k in _SNAPSHOT_EXTRAS if hasattr(entity, k)})
+    equip_stats = {k: v for k, v in entity.equip_stats.__dict__().items() if v}
+    if equip_stats:
+        data["equip_stats"] = equip_stats
+    return data
+
+
+def restore(data: Dict[str, Any]) -> Entity:
+    """Rebuild a combat ready entity from `snapshot` data"""
+    entity = Entity(data=data)
+    entity.equip_stats = Stats(**data.get("equip_stats", {}))
+    for k in _SNAPSHOT_EXTRAS:
+        if k in data:
+            setattr(entity, k, data[k])
+    return entity
+
+
+def simulate_snapshot(
+    participants: Dict[str, Dict[str, Any]],
+    names: Dict[str, str],
+    monster: Dict[str, Any],
+    seed: Optional[int] = None,
+) -> CombatResult:
+    """`simulate_raid` on snapshots, the entry point of pool workers"""
+    return simulate_raid(
+        {k: restore(v) for k, v in participants.items()},
+        names,
+        restore(monster),
+        seed,
+    )
+
+
+def record_raid(
+    participants: Dict[str, Entity],
+    names: Dict[str, str],
+    monster: Monster,
+    seed: int,
+) -> Dict[str, Any]:
+    """Everything `replay` needs to run the same raid again, take it before combat"""
+    return {
+        "seed": seed,
+        "monster": snapshot(monster),
+        "participants": {k: snapshot(v) for k, v in participants.items()},
+        "names": dict(names),
+    }
+
+
+def replay(record: Dict[str, Any]) -> CombatResult:
+    """
+    Run a recorded raid again
+
+    With unchanged combat rules this gives the very same events as the
+    original raid, after a balance change it shows how the raid would go now.
+    """
+    return simulate_snapshot(
+        record["participants"], record["names"], record["monster"], record["seed"]
+    )
+
+
+class RaidExecutor:
+    """
+    Runs raid simulations inline or in a process pool
+
+    In "process" mode raids with at least `threshold` participants are sent
+    to a worker as snapshots so the event loop keeps serving other guilds,
+    smaller raids are cheaper to run inline than to pickle.
+    """
+
+    def __init__(self, mode: str = "inline", workers: int = 2, threshold: int = 8):
+        self.mode = mode
+        self.workers = workers
+        self.threshold = threshold
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def run(
+        self,
+        participants: Dict[str, Entity],
+        names: Dict[str, str],
+        monster: Monster,
+        seed: Optional[int] = None,
+    ) -> CombatResult:
+        if self.mode != "process" or len(participants) < self.threshold:
+            return simulate_raid(participants, names, monster, seed)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._pool,
+            simulate_snapshot,
+            {k: snapshot(v) for k, v in participants.items()},
+            names,
+            snapshot(monster),
+            seed,
+        )
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class Combatant:
+    """
+    Combat stats of one entity, computed once and frozen for the raid
+
+    Reading `Entity` properties walks the whole stat chain on every access,
+    the round loop reads these plain slots instead.
+    """
+
+    __slots__ = (
+        "job",
+        "level",
+        "health",
+        "remain_stat",
+        "agility",
+        "critical_chance",
+        "dexterity",
+        "stamina",
+        "mystic",
+        "tenacity",
+        "damage_type",
+        "low",
+        "high",
+    )
+
+    def __init__(self, entity: Entity):
+        low, high = entity.damage_range
+        for name, value in (
+            ("job", getattr(entity, "job", "novice")),
+            ("level", entity.level),
+            ("health", entity.health),
+            ("remain_stat", getattr(entity, "remain_stat", 0)),
+            ("agility", entity.agility),
+            ("critical_chance", entity.critical_chance),
+            ("dexterity", entity.dexterity),
+            ("stamina", entity.stamina),
+            ("mystic", entity.mystic),
+            ("tenacity", entity.tenacity),
+            ("damage_type", entity.damage_type),
+            ("low", low),
+            ("high", high),
+        ):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is frozen")
+
+    def __repr__(self) -> str:
+        return f"<Combatant {self.job} Lv.{self.level}>"
+
+
+def _simulate(
+    participants: Dict[str, Entity],
+    names: Dict[str, str],
+    mob: Monster,
+    rng: random.Random,
+) -> CombatResult:
+    stats = {k: Combatant(v) for k, v in participants.items()}
+    boss = Combatant(mob)  # rebuilt whenever the mods scale
+    health_point = {k: int(v.health) for k, v in stats.items()}
+    damage_record = {k: [] for k in participants}
+
+    if mob.elite:
+        monster_health = FIBONACCI[int(mob.level / 10) + 1] + mob.health
+    else:
+        monster_health = FIBONACCI[int(mob.level / 10)] + mob.health
+    m_health = monster_health
+
+    parts = {
+        k: v
+        for k, v in sorted(
+            {**stats, "mob": boss}.items(),
+            key=lambda item: item[1].agility,
+            reverse=True,
+        )
+    }
+
+    events: List[CombatEvent] = []
+
+    def emit(kind: int, actor: str, target: str = "mob", amount: int = 0, extra=0):
+        events.append(CombatEvent(round_cnt, actor, target, kind, amount, extra))
+
+    combat_finished = False
+    killer = None
+    round_cnt = 0
+
+    mob_agility = boss.agility
+
+    while not combat_finished:
+        if sum(health_point.values()) <= 0:
+            emit(EventKind.WIPE, "mob", "mob")
+            break
+
+        round_cnt += 1
+        emit(EventKind.ROUND, "mob", "mob")
+        for user_id in parts:
+            if monster_health <= 0:
+                break
+            if user_id != "mob":
+                player = parts[user_id]
+                job = player.job
+                berserker = False
+                wizard = False
+                rogue = False
+                bishop = False
+                paladin = False
+                if health_point[user_id] <= 0:
+                    continue
+                health_perc = health_point[user_id] / player.health
+                if player.agility / mob_agility <= rng.random():
+                    if job == "bishop":
+                        pass
+                    # rogue
+                    elif job == "rogue" and rng.random() <= max(
+                        0.5, (0.3 + 1000 / (player.agility + 1000))
+                    ):
+                        pass
+                    elif job == "berserker" and rng.random() <= (
+                        0.3 + ((1 - health_perc) * 0.5)
+                    ):
+                        berserker = True
+                    else:
+                        emit(EventKind.MISS, user_id)
+                        continue
+                crit_ratio = (
+                    (1.8 if job == "rogue" else 1.5)
+                    if rng.random() * 100 < player.critical_chance
+                    else 1
+                )
+
+                damage_dealt = max(
+                    int(
+                        (rng.randint(player.low, player.high) * crit_ratio)
+                        - boss.tenacity
+                    ),
+                    0,
+                )
+                # rogue
+                if job == "rogue" and rng.random() <= 0.3:
+                    damage_dealt = int(
+                        (damage_dealt / 3.8) + (m_health - monster_health) * 0.01
+                    )
+                    att_cnt = int(fib_index(rng.random() * player.dexterity))
+                    damage_dealt *= att_cnt
+                    rogue = True
+
+                # berserker
+                elif berserker or (
+                    job == "berserker"
+                    and rng.random() <= (0.3 + ((1 - health_perc) * 0.5))
+                    and damage_dealt != 0
+                ):
+                    damage_dealt = player.high
+                    damage_dealt *= 5.28 * (1 - health_perc)
+                    damage_dealt *= 2.69
+                    damage_dealt = int(damage_dealt)
+                    health_point[user_id] = max(int(health_point[user_id] / 2), 1)
+                    berserker = True
+
+                # wizard
+                elif job == "wizard" and rng.random() <= 0.5 and damage_dealt != 0:
+                    damage_dealt = int(damage_dealt * 3.14)
+                    damage_dealt += max(int(monster_health * 0.08), 1)
+                    wizard = True
+
+                # bishop
+                elif job == "bishop":
+                    damage_dealt = 1
+                    bishop = True
+                monster_health -= damage_dealt
+                damage_record[user_id].append(damage_dealt)
+
+                if damage_dealt == 0:
+                    emit(EventKind.NO_EFFECT, user_id)
+                elif rogue:
+                    emit(EventKind.SNEAK, user_id, amount=damage_dealt, extra=att_cnt)
+                elif berserker:
+                    emit(EventKind.FRENZY, user_id, amount=damage_dealt)
+                elif wizard:
+                    emit(EventKind.ELEMENT, user_id, amount=damage_dealt)
+                elif paladin:
+                    emit(EventKind.SMITE, user_id, amount=damage_dealt)
+                elif bishop:
+                    if rng.random() < 0.2 + player.remain_stat / 200:
+                        if rng.random() < 0.01:
+                            emit(EventKind.JUDGEMENT, user_id, amount=monster_health)
+                            damage_record[user_id].append(monster_health - 1)
+                            monster_health = 0
+                            killer = user_id
+                            break
+
+                        heal_amount = (
+                            int(
+                                player.mystic
+                                * player.level
+                                / len([k for k, v in health_point.items() if v != 0])
+                                / 5
+                            )
+                            - 1
+                        )
+                        damage_record[user_id].append(int(heal_amount / 2))
+                        for k, v in health_point.items():
+                            if v != 0:
+                                health_point[k] += min(heal_amount, stats[k].health - v)
+                        emit(EventKind.MIRACLE, user_id, "party", heal_amount)
+
+                    else:
+                        emit(EventKind.PRAY_FAIL, user_id)
+                        damage_record[user_id].append(-1)
+                elif crit_ratio != 1:
+                    emit(EventKind.CRIT, user_id, amount=damage_dealt)
+                elif not player.damage_type:
+                    emit(EventKind.MAGIC, user_id, amount=damage_dealt)
+                else:
+                    emit(EventKind.HIT, user_id, amount=damage_dealt)
+                if monster_health <= 0:
+                    killer = user_id
+                    break
+            else:
+                emit(EventKind.MOB_TURN, "mob", "party")
+                for target_id in parts.keys():
+                    paladin = False
+                    berserker = False
+                    if monster_health <= 0:
+                        continue
+                    if target_id == "mob":
+                        continue
+                    if health_point[target_id] <= 0:
+                        continue
+                    target = parts[target_id]
+                    job = target.job
+                    if not target.damage_type and (
+                        min(boss.agility / target.agility, 0.75) <= rng.random()
+                    ):
+                        emit(EventKind.DODGE, "mob", target_id)
+                        continue
+                    elif (boss.agility / target.agility) <= rng.random():
+                        emit(EventKind.DODGE, "mob", target_id)
+                        continue
+                    # rogue
+                    if job == "rogue" and rng.random() <= max(
+                        0.5, (0.3 + 1000 / (boss.agility + 1000))
+                    ):
+                        emit(EventKind.SHADOW, "mob", target_id)
+                        continue
+                    if job == "bishop" and rng.random() < min(
+                        0.2 + target.remain_stat / 500, 0.8
+                    ):
+                        emit(EventKind.PROTECTED, "mob", target_id)
+                        continue
+                    crit_ratio = 1.5 if rng.random() * 100 < boss.critical_chance else 1
+                    damage_dealt = max(
+                        int(
+                            (rng.randint(boss.low, boss.high) * crit_ratio)
+                            - target.tenacity
+                        ),
+                        0,
+                    )
+                    # paladin
+                    if job == "paladin":
+                        paladin = True
+                    # berserker
+                    if job == "berserker" and damage_dealt != 0 and rng.random() <= 0.8:
+                        if (
+                            health_point[target_id] != 1
+                            and damage_dealt > health_point[target_id]
+                        ):
+                            damage_dealt = health_point[target_id] - 1
+                            berserker = True
+                        else:
+                            damage_dealt = int(damage_dealt * 2.5)
+
+                    health_point[target_id] -= min(
+                        damage_dealt, health_point[target_id]
+                    )
+                    if damage_dealt == 0:
+                        emit(EventKind.IGNORED, "mob", target_id)
+                    elif paladin:
+                        thornmail = int(damage_dealt * 0.27) + int(target.stamina)
+                        damage_deflect = int(
+                            min(thornmail * 2.4, health_point[target_id])
+                        )
+                        health_point[target_id] -= min(
+                            damage_deflect, health_point[target_id]
+                        )
+                        emit(
+                            EventKind.BLOCK,
+                            "mob",
+                            target_id,
+                            damage_deflect + damage_dealt,
+                        )
+
+                        if rng.random() < 0.7:
+                            monster_health -= min(thornmail, monster_health)
+                            emit(EventKind.SHIELD_BASH, target_id, amount=thornmail)
+                            damage_record[target_id].append(thornmail)
+                    elif berserker:
+                        emit(EventKind.ENDURE, "mob", target_id, damage_dealt)
+                    elif crit_ratio != 1:
+                        emit(EventKind.CRIT_TAKEN, "mob", target_id, damage_dealt)
+                    elif not boss.damage_type:
+                        emit(EventKind.MAGIC_TAKEN, "mob", target_id, damage_dealt)
+                    else:
+                        emit(EventKind.TAKEN, "mob", target_id, damage_dealt)
+                    if health_point[target_id] <= 0:
+                        emit(EventKind.DEATH, "mob", target_id)
+                    if monster_health <= 0:
+                        killer = target_id
+                        break
+
+        if monster_health <= 0:
+            emit(EventKind.DEATH, killer, "mob")
+            combat_finished = True
+
+        else:
+            mob.vit_mod += 0.8 * round_cnt
+            mob.dex_mod += 0.4 * round_cnt
+            mob.mys_mod += 0.8 * round_cnt
+            mob.sta_mod += 0.6 * round_cnt
+            boss = Combatant(mob)
+
+    return CombatResult(
+        won=sum(health_point.values()) > 0,
+        rounds=round_cnt,
+        killer=killer,
+        monster_health=max(monster_health, 0),
+        monster_max_health=m_health,
+        health=health_point,
+        damage=damage_record,
+        monster_name=mob.name,
+        events=events,
+    )
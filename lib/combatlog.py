@@ -0,0 +1,187 @@
+import gzip
+from enum import IntEnum
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+
+class EventKind(IntEnum):
+    ROUND = 0
+    WIPE = 1  # every participant is down
+    MISS = 2
+    NO_EFFECT = 3
+    SNEAK = 4  # rogue multi hit, extra is the hit count
+    FRENZY = 5  # berserker
+    ELEMENT = 6  # wizard
+    SMITE = 7  # paladin
+    JUDGEMENT = 8  # bishop instant kill
+    MIRACLE = 9  # bishop party heal
+    PRAY_FAIL = 10
+    CRIT = 11
+    MAGIC = 12
+    HIT = 13
+    MOB_TURN = 14
+    DODGE = 15
+    SHADOW = 16  # rogue dodge
+    PROTECTED = 17  # bishop block
+    IGNORED = 18
+    BLOCK = 19  # paladin takes the hit
+    SHIELD_BASH = 20  # paladin counter
+    ENDURE = 21  # berserker survives at 1 health
+    CRIT_TAKEN = 22
+    MAGIC_TAKEN = 23
+    TAKEN = 24
+    DEATH = 25
+
+
+class CombatEvent(NamedTuple):
+    """One action of a raid, actor and target are a user id, mob or party"""
+
+    round: int
+    actor: str
+    target: str
+    kind: EventKind
+    amount: int = 0
+    extra: int = 0
+
+
+_TEMPLATES = {
+    EventKind.WIPE: "**{mob}** 擊敗了所有的冒險者！\n",
+    EventKind.MISS: "{actor} 的攻擊沒有命中！\n",
+    EventKind.NO_EFFECT: "{actor} 的攻擊沒有任何效果...\n",
+    EventKind.SNEAK: (
+        "{actor} 偷襲了{mob}，攻擊了{extra}下後，總共造成{amount:,}點傷害！\n"
+    ),
+    EventKind.FRENZY: "{actor} 捨命狂擊，消耗自身生命對{mob}造成{amount:,}點傷害！\n",
+    EventKind.ELEMENT: "{actor} 感受到了元素的波動，對{mob}造成{amount:,}點傷害！\n",
+    EventKind.SMITE: "{actor} 對{mob}進行制裁，造成{amount:,}點傷害！\n",
+    EventKind.JUDGEMENT: (
+        "隨著{actor}的虔誠禱告，遠方響起了號角的聲響。雲隙間閃爍著光芒，"
+        "降下了神明的怒火。\n造成了{amount}點審判傷害。\n"
+    ),
+    EventKind.MIRACLE: "{actor} 的祈禱觸發了神蹟，為現場隊友回復{amount:,}生命值。\n",
+    EventKind.PRAY_FAIL: "{actor} 拼命的禱告，然而並沒有得到回應...\n",
+    EventKind.CRIT: "{actor} 瞄準了弱點，造成了{amount:,}點爆擊傷害！\n",
+    EventKind.MAGIC: "{actor} 造成了{amount:,}點魔法傷害！\n",
+    EventKind.HIT: "{actor} 造成了{amount:,}點傷害！\n",
+    EventKind.MOB_TURN: "*** {mob}即將對冒險者發起攻擊！\n",
+    EventKind.DODGE: "{target}躲避了攻擊！\n",
+    EventKind.SHADOW: "{target}沉入陰影，躲避了攻擊！\n",
+    EventKind.PROTECTED: "一股神秘力量保護了{target}免於受到傷害。\n",
+    EventKind.IGNORED: "{target}無視了攻擊的傷害！\n",
+    EventKind.BLOCK: "{target} 抵擋了{mob}的攻擊，承受了{amount:,}的傷害！\n",
+    EventKind.SHIELD_BASH: "{actor}使出盾擊！對{mob}造成了{amount:,}點相應傷害！\n",
+    EventKind.ENDURE: "{target} 受到了致命傷害，但是他忍住了！\n",
+    EventKind.CRIT_TAKEN: "{target} 被抓住弱點，受到了{amount:,}點爆擊傷害！\n",
+    EventKind.MAGIC_TAKEN: "{target} 受到了{amount:,}點魔法傷害！\n",
+    EventKind.TAKEN: "{target} 受到了{amount:,}點傷害！\n",
+    EventKind.DEATH: "{target} 已死亡！\n",
+}
+
+
+class CombatLog:
+    """
+    Append-only combat log rendered once
+
+    Lines are collected in a list and joined at the end. Once the log grows
+    past `cap` bytes whole rounds are dropped, only the latest round is kept
+    so the ending of the fight is always readable, and a summary of the
+    skipped rounds takes their place.
+    """
+
+    def __init__(self, cap: int = 0):
+        self.cap = cap  # 0 keeps everything
+        self.size = 0
+        self._head: List[str] = []
+        self._tail: List[str] = []  # latest round once truncating
+        self._tail_round = 0
+        self._tail_size = 0
+        self._first_dropped = 0
+        self._last_dropped = 0
+        self._dropped_lines = 0
+
+    @property
+    def truncated(self) -> bool:
+        return self._first_dropped > 0
+
+    def new_round(self, round_cnt: int) -> None:
+        if self.truncated or (self.cap and self.size > self.cap):
+            if self._tail_round:
+                self._drop_tail()
+            self._tail_round = round_cnt
+            if not self._first_dropped:
+                self._first_dropped = round_cnt
+        self.write(f"--- Round {round_cnt}" + "-" * 20 + "\n")
+
+    def write(self, line: str) -> None:
+        size = len(line.encode())
+        self.size += size
+        if self._tail_round:
+            self._tail.append(line)
+            self._tail_size += size
+        else:
+            self._head.append(line)
+
+    def _drop_tail(self) -> None:
+        self._last_dropped = self._tail_round
+        self._dropped_lines += len(self._tail)
+        self.size -= self._tail_size
+        self._tail = []
+        self._tail_size = 0
+
+    def render(self) -> str:
+        if not self._last_dropped:
+            return "".join(self._head) + "".join(self._tail)
+        summary = (
+            f"... 省略了第 {self._first_dropped} - {self._last_dropped} 回合"
+            f" ({self._dropped_lines:,} 行) ...\n"
+        )
+        return "".join(self._head) + summary + "".join(self._tail)
+
+
+def render_events(
+    events: Iterable[CombatEvent],
+    names: Dict[str, str],
+    mob_name: str,
+    cap: int = 0,
+) -> str:
+    """
+    Turn combat events into the readable combat log
+
+    Parameters
+    ----------
+    events: Iterable[CombatEvent] - events in the order they happened
+    names: Dict[str, str] - user id to display name
+    mob_name: str - name of the monster
+    cap: int - byte cap passed to `CombatLog`, 0 keeps everything
+    """
+    combat_log = CombatLog(cap)
+    names = {**names, "mob": mob_name}
+    for event in events:
+        if event.kind == EventKind.ROUND:
+            combat_log.new_round(event.round)
+            continue
+        combat_log.write(
+            _TEMPLATES[event.kind].format(
+                actor=names.get(event.actor, event.actor),
+                target=names.get(event.target, event.target),
+                mob=mob_name,
+                amount=event.amount,
+                extra=event.extra,
+            )
+        )
+    return combat_log.render()
+
+
+def pack_log(
+    text: str, filename: str = "combat.log", threshold: int = 0
+) -> Tuple[bytes, str]:
+    """
+    Encode a log for upload, gzipped when larger than threshold bytes
+
+    Returns
+    -------
+    Tuple[bytes, str] - file content and the filename to upload it as
+    """
+    data = text.encode()
+    if threshold and len(data) > threshold:
+        return gzip.compress(data), filename + ".gz"
+    return data, filename
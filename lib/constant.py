@@ -2,6 +2,26 @@ CHARACTER_LEVEL_LIMIT = 50
 WORLD_LEVEL_LIMIT = 10
 EXP_MULTIPLIER = 1
 
+STORAGE_BACKEND = "sqlite"  # "sqlite" or "json"
+DATABASE_PATH = "dungeon.db"
+FLUSH_INTERVAL = 5  # seconds between write-behind flushes of a dirty key
+PLAYER_CACHE_SIZE = 1024  # live Player objects kept by the identity map
+ITEM_EMBED_CACHE_SIZE = 4096  # rendered backpack embeds, keyed by item id
+RENDER_CACHE_SIZE = 2048  # rendered player sheets and world info embeds
+SIMULATION_MODE = "inline"  # "inline" or "process"
+SIMULATION_WORKERS = 2  # process pool size in "process" mode
+SIMULATION_THRESHOLD = 8  # participants needed before a raid leaves the loop
+COMBAT_LOG_CAP = 1_000_000  # bytes kept before middle rounds are dropped
+COMBAT_LOG_GZIP = 256_000  # bytes above which combat.log is uploaded gzipped
+RAID_TIMEOUT = 180  # seconds after recruiting before a stuck raid is released
+RAID_HISTORY_LIMIT = 5_000  # replay records kept, oldest are pruned first
+SCRUB_INTERVAL = 60  # seconds between consistency scrubber batches
+SCRUB_BATCH = 50  # users checked per scrubber batch
+SCRUB_SLICE = 0.005  # seconds a batch runs before yielding to the event loop
+METRICS_PATH = "dungeon_metrics.prom"  # prometheus text dump, empty disables it
+METRICS_INTERVAL = 60  # seconds between metric dumps
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
 DEV = [164900704526401545]
 
 LEGENDARY_SETS = [
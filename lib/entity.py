@@ -1,4 +1,5 @@
 import random
+from typing import Tuple
 
 from .base import Stats, StatsModified
 
@@ -105,3 +106,37 @@ class Entity(StatsModified):
     @property
     def mdmg(self) -> int:
         return random.randint(self._magical_base_damage, self._magical_max_damage)
+
+    @property
+    def agility(self) -> float:
+        """Decides turn order and evasion"""
+        return round(self.speed + self.dexterity, 4)
+
+    @property
+    def critical_chance(self) -> float:
+        """Critical chance is a percentage in float, not a number"""
+        return round(self.luck * self.accuracy / 100, 4)
+
+    @property
+    def tenacity(self) -> int:
+        """Flat damage reduction on every hit taken"""
+        return int(self.stamina / 2)
+
+    @property
+    def damage_type(self) -> bool:
+        """True for physical damage, False for magical damage"""
+        return self.vitality >= self.mystic
+
+    @property
+    def damage_range(self) -> Tuple[int, int]:
+        if self.damage_type:
+            return self._physical_base_damage, self._physical_max_damage
+        return self._magical_base_damage, self._magical_max_damage
+
+    @property
+    def damage(self) -> int:
+        return random.randint(*self.damage_range)
+
+    @property
+    def high_damage(self) -> int:
+        return self.damage_range[1]
@@ -0,0 +1,98 @@
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .base import Stats
+from .item import Item
+
+SLOTS = ("head", "necklace", "body", "pants", "gloves", "boots", "weapon", "ring")
+SLOT_NAMES = {
+    "head": "頭部",
+    "necklace": "項鍊",
+    "body": "上衣",
+    "pants": "褲子",
+    "gloves": "手套",
+    "boots": "靴子",
+    "weapon": "武器",
+    "ring": "戒指",
+}
+STATS = ("vit", "dex", "sta", "mys", "luk")
+
+# set name -> (blessing name, tiers of (pieces, stat, flat bonus, multiplier))
+SET_BONUS = {
+    "Behemoth": (
+        "貝西摩斯的猖狂",
+        ((3, "vit", 200, 1.6), (6, "dex", 300, 1), (8, "dex", 0, 2.5)),
+    ),
+    "Leviathan": (
+        "利維坦的傲慢",
+        ((3, "sta", 200, 1.1), (6, "mys", 300, 1), (8, "mys", 0, 2.1)),
+    ),
+    "Tiamat": (
+        "提亞馬特的狂妄",
+        ((3, "vit", 200, 1.9), (6, "sta", 300, 1), (8, "sta", 0, 1.9)),
+    ),
+}
+TIERS = ("I", "II", "III")
+
+
+class EquipmentAggregate:
+    """
+    Equipment stats maintained slot by slot
+
+    Changing a slot subtracts the old item and adds the new one, set bonuses
+    are recomputed from per-set piece counters, so an equip change never
+    needs to look at the other equipped items.
+    """
+
+    def __init__(self):
+        self.slots: Dict[str, Tuple[str, Tuple[int, ...], str]] = {}
+        self.base: List[int] = [0] * len(STATS)
+        self.sets: Counter = Counter()
+
+    @staticmethod
+    def contribution(item: Item) -> Tuple[int, ...]:
+        return (
+            item.vit + item.r_stats.vit,
+            item.dex + item.r_stats.dex,
+            item.sta + item.r_stats.sta,
+            item.mys + item.r_stats.mys,
+            item.luk,
+        )
+
+    def set_slot(self, slot: str, item_id: str, item: Optional[Item]) -> None:
+        """Replace whatever is in slot, an empty item_id or None item clears it"""
+        old = self.slots.pop(slot, None)
+        if old is not None:
+            _, stats, _set = old
+            for i, v in enumerate(stats):
+                self.base[i] -= v
+            if _set:
+                self.sets[_set] -= 1
+        if not item_id or item is None:
+            return
+        stats = self.contribution(item)
+        for i, v in enumerate(stats):
+            self.base[i] += v
+        if item._set:
+            self.sets[item._set] += 1
+        self.slots[slot] = (item_id, stats, item._set)
+
+    def item_id(self, slot: str) -> str:
+        entry = self.slots.get(slot, None)
+        return entry[0] if entry else ""
+
+    def totals(self) -> Tuple[Stats, List[str]]:
+        """Equip stats with set bonuses applied, and the active blessings"""
+        stats = dict(zip(STATS, self.base))
+        blessing = []
+        for _set, (name, tiers) in SET_BONUS.items():
+            pieces = self.sets.get(_set, 0)
+            tier = 0
+            for need, stat, flat, mult in tiers:
+                if pieces < need:
+                    break
+                stats[stat] = int((stats[stat] + flat) * mult)
+                tier += 1
+            if tier:
+                blessing.append(f"{name} {TIERS[tier - 1]}")
+        return Stats(**stats), blessing
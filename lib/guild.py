@@ -1,6 +1,7 @@
 from discord import Colour
 
 from .constant import WORLD_LEVEL_LIMIT
+from .progression import resolve_levels, world_exp_required
 
 
 class Guild:
@@ -18,7 +19,7 @@ class Guild:
         # guild record
         self.monster_cnt = data.get("monster_cnt", 0)
         self.leaderboard = data.get("leaderboard", {})  # top 10 by level
-        self.results = data.get("results", [])  # difficulty adjustment
+        self.results = list(data.get("results", []))  # difficulty adjustment
         self.spawn_level = data.get("spawn_level", 1)
 
         # guild data
@@ -33,7 +34,7 @@ class Guild:
             "name": self.name,
             "status": self.status,
             "colour": self.colour.value,
-            "adv_channel_id": self.adv_channel_id,
+            "dungeon_channel": self.dungeon_channel,
             "level": self.level,
             "exp": self.exp,
             "monster_cnt": self.monster_cnt,
@@ -44,23 +45,15 @@ class Guild:
         }
 
     def exp_required(self, level: int) -> int:
-        return round(
-            22.069 * pow(level, 7)
-            + 42.069 * pow(level, 5)
-            + 69.69 * pow(level, 4)
-            + 74.8 * pow(level, 3)
-            + 97.5 * pow(level, 2)
-            + 116.55 * (level)
-        )
+        return world_exp_required(level)
 
-    def check_levelup(self) -> bool:
-        if self.level == WORLD_LEVEL_LIMIT:
-            return False
-        if self.exp >= self.exp_required(self.level):
-            self.level += 1
-            self.exp = 0
-            return True
-        return False
+    def check_levelup(self) -> int:
+        """Returns the number of levels gained"""
+        level = self.level
+        self.level, self.exp = resolve_levels(
+            level, self.exp, world_exp_required, WORLD_LEVEL_LIMIT
+        )
+        return self.level - level
 
     def add_exp(self, exp: int) -> None:
         self.exp += exp
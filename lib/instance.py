@@ -8,7 +8,7 @@ class InstanceHandler:
         guild: Guild,
         info: MonsterInfo,
     ):
-        self.guild_id = guild.id
+        self.guild_id = guild.guild_id
         self.dungeon_channel = guild.dungeon_channel
         self.monster = Monster(info=info, level=guild.spawn_level)
 
@@ -1,4 +1,5 @@
 import random
+from typing import Dict, Optional, Tuple
 
 from .base import Stats
 from .constant import LEGENDARY_SETS
@@ -6,25 +7,27 @@ from .constant import LEGENDARY_SETS
 
 class Item(Stats):
     def __init__(self, *, data: dict = {}):
+        # item templates in data/ still use the old stat and field names
         super().__init__(
-            vit=data.get("vit", 0),
+            vit=data.get("vit", data.get("str", 0)),
             dex=data.get("dex", 0),
-            sta=data.get("sta", 0),
-            mys=data.get("mys", 0),
+            sta=data.get("sta", data.get("con", 0)),
+            mys=data.get("mys", data.get("wis", 0)),
             luk=data.get("luk", 0),
         )
-        self._type = data.get("_type", "")
+        self.template = data.get("template", "")  # key in the item catalog
+        self._type = data.get("_type", data.get("category", ""))
         self.level = data.get("level", 1)
         self.name = data.get("name", "")
         self.description = data.get("description", "")
 
-        self._set = data.get("_set", False)
+        self._set = data.get("_set", data.get("set", False))
 
         self.reinforced = data.get("reinforced", 0)
         self.attempts = data.get("attempts", 0)
         self.state = data.get("state", True)
 
-        r_stats = data.get("reinforced_stats", {})
+        r_stats = data.get("r_stats", data.get("reinforced_stats", {}))
         self.r_stats = Stats()
         self.r_stats.vit = r_stats.get("vit", 0)
         self.r_stats.dex = r_stats.get("dex", 0)
@@ -32,9 +35,35 @@ class Item(Stats):
         self.r_stats.mys = r_stats.get("mys", 0)
 
     def __copy__(self) -> "Item":
-        return Item(data=self.__dict__())
+        item = Item(data=self._full_dict())
+        item.template = self.template
+        return item
 
     def __dict__(self) -> dict:
+        """Items made from a template only store their own deltas"""
+        if self.template:
+            return {
+                "template": self.template,
+                "level": self.level,
+                "reinforced": self.reinforced,
+                "attempts": self.attempts,
+                "state": self.state,
+            }
+        return self._full_dict()
+
+    @property
+    def category(self) -> str:
+        return self._type
+
+    @property
+    def set(self) -> str:
+        return self._set
+
+    @property
+    def reinforced_stats(self) -> Stats:
+        return self.r_stats
+
+    def _full_dict(self) -> dict:
         return {
             "_type": self._type,
             "level": self.level,
@@ -52,9 +81,19 @@ class Item(Stats):
             "r_stats": self.r_stats.__dict__(),
         }
 
+    def stats_adjustment(self) -> None:
+        """scales template stats to item level, legendary sets keep theirs"""
+        if self._set in LEGENDARY_SETS:
+            return
+        self.vit = round(self.vit * self.level)
+        self.dex = round(self.dex * self.level)
+        self.sta = round(self.sta * self.level)
+        self.mys = round(self.mys * self.level)
+        self.luk = round(self.luk * self.level)
+
     def _refresh_r_stats(self) -> None:
         """adjusts stats based on reinforcement"""
-        rate = 0.3 if self.set in LEGENDARY_SETS else 0.15
+        rate = 0.3 if self._set in LEGENDARY_SETS else 0.15
         if self.reinforced <= 10:
             rate *= 1.5
         elif self.reinforced <= 15:
@@ -72,8 +111,8 @@ class Item(Stats):
         """only accounts for success, drop and destroy, doesn't calculate stats"""
         if not self.state:
             return False
-        self.reinforce_attempts += 1
-        if self.set in LEGENDARY_SETS:
+        self.attempts += 1
+        if self._set in LEGENDARY_SETS:
             if 0.5 > random.random():
                 self.reinforced += 1
                 return True
@@ -93,3 +132,66 @@ class Item(Stats):
                         return None
                     self.reinforced -= 1
                 return False
+
+
+class ItemCatalog:
+    """
+    Item templates shared by every item instance
+
+    Stored items only keep `template`, `level`, `reinforced`, `attempts` and
+    `state`, name, description and stats are derived here from the template.
+    """
+
+    def __init__(self, templates: Dict[str, Item]):
+        self.templates = templates
+        for key, template in templates.items():
+            template.template = key
+        self._names = {template.name: key for key, template in templates.items()}
+        self._derived: Dict[Tuple[str, int, int], dict] = {}
+
+    def __getitem__(self, key: str) -> Item:
+        return self.templates[key]
+
+    def _derive(self, key: str, level: int, reinforced: int) -> dict:
+        """full item data shared by every instance with the same key"""
+        derived = self._derived.get((key, level, reinforced), None)
+        if derived is None:
+            item = self.templates[key].__copy__()
+            item.level = level
+            item.name = f"Lv. {level} {item.name}"
+            item.stats_adjustment()
+            item.reinforced = reinforced
+            item._refresh_r_stats()
+            derived = item._full_dict()
+            self._derived[(key, level, reinforced)] = derived
+        return derived
+
+    def create(self, key: str, level: int = 1) -> Item:
+        return self.load({"template": key, "level": level})
+
+    def match(self, record: dict) -> Optional[str]:
+        """catalog key of a full legacy record, None if it isn't an untouched copy"""
+        item = Item(data=record)
+        prefix = f"Lv. {item.level} "
+        if not item.name.startswith(prefix):
+            return None
+        key = self._names.get(item.name[len(prefix) :], None)
+        if key is None:
+            return None
+        derived = self._derive(key, item.level, item.reinforced)
+        full = item._full_dict()
+        if any(full[k] != derived[k] for k in full if k not in ("attempts", "state")):
+            return None
+        return key
+
+    def load(self, record: dict) -> Item:
+        """Build an item from a stored record, full legacy records still work"""
+        key = record.get("template", "")
+        if key not in self.templates:
+            return Item(data=record)
+        data = self._derive(key, record.get("level", 1), record.get("reinforced", 0))
+        item = Item(data=data)
+        item.template = key
+        item.attempts = record.get("attempts", 0)
+        item.state = record.get("state", True)
+        return item
@@ -0,0 +1,90 @@
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class Leaderboard:
+    """
+    Player ranking kept sorted by (rebirth, level, exp)
+
+    Updated from store writes, so reading the top of the board or the rank
+    of a single player never sorts the whole user file.
+    """
+
+    def __init__(self, exclude: Iterable[int] = ()):
+        self.exclude = {str(k) for k in exclude}
+        # (-rebirth, -level, -exp, user_id), kept sorted with bisect
+        self._ranked: List[Tuple[int, int, int, str]] = []
+        self._keys: Dict[str, Tuple[int, int, int, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ranked)
+
+    def __contains__(self, user_id: Any) -> bool:
+        return str(user_id) in self._keys
+
+    @staticmethod
+    def _key(user_id: str, record: dict) -> Tuple[int, int, int, str]:
+        return (
+            -record.get("rebirth", 0),
+            -record.get("level", 1),
+            -record.get("exp", 0),
+            user_id,
+        )
+
+    def build(self, records: Dict[str, dict]) -> None:
+        """Rebuild the whole board from every player record"""
+        self._keys = {
+            str(k): self._key(str(k), v)
+            for k, v in records.items()
+            if isinstance(v, dict) and str(k) not in self.exclude
+        }
+        self._ranked = sorted(self._keys.values())
+
+    def update(self, user_id: Any, record: Optional[dict]) -> None:
+        """Reposition one player, a None record removes them"""
+        user_id = str(user_id)
+        if record is None or user_id in self.exclude:
+            self.remove(user_id)
+            return
+        key = self._key(user_id, record)
+        old = self._keys.get(user_id, None)
+        if old == key:
+            return
+        if old is not None:
+            self._discard(old)
+        insort(self._ranked, key)
+        self._keys[user_id] = key
+
+    def remove(self, user_id: Any) -> None:
+        old = self._keys.pop(str(user_id), None)
+        if old is not None:
+            self._discard(old)
+
+    def _discard(self, key: Tuple[int, int, int, str]) -> None:
+        del self._ranked[bisect_left(self._ranked, key)]
+
+    def rank(self, user_id: Any) -> Optional[int]:
+        """1-based rank of the player, None if not ranked"""
+        key = self._keys.get(str(user_id), None)
+        if key is None:
+            return None
+        return bisect_left(self._ranked, key) + 1
+
+    def top(self, limit: int = 50, offset: int = 0) -> List[Tuple[int, str, dict]]:
+        """
+        Slice of the board
+
+        Returns
+        -------
+        List[Tuple[int, str, dict]] - (rank, user_id, {rebirth, level, exp})
+        """
+        return [
+            (
+                offset + i,
+                user_id,
+                {"rebirth": -rebirth, "level": -level, "exp": -exp},
+            )
+            for i, (rebirth, level, exp, user_id) in enumerate(
+                self._ranked[offset : offset + limit], start=1
+            )
+        ]
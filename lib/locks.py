@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+
+class Lease(NamedTuple):
+    holder: Any  # e.g. the channel id of the raid holding the lock
+    expires: float  # unix time
+    token: int  # returned by `acquire`, needed to release this lease
+
+
+class LockManager:
+    """
+    Named locks that expire on their own
+
+    Every acquire pushes its expiry on a min-heap, expired leases are
+    reclaimed lazily in O(log n) each the next time the manager is touched,
+    so a lock whose release was skipped by an exception can't leak. Each
+    lease has its own token, a holder that outlived its lease can't release
+    the lock someone else took since.
+    """
+
+    def __init__(self, name: str, ttl: float):
+        self.name = name
+        self.ttl = ttl
+        self._leases: Dict[Hashable, Lease] = {}
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._seq = 0
+        self.acquired = 0
+        self.released = 0
+        self.expired = 0
+        self.contended = 0  # acquires refused because the lock was held
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.lease(key) is not None
+
+    def __len__(self) -> int:
+        self.reclaim()
+        return len(self._leases)
+
+    def lease(self, key: Hashable) -> Optional[Lease]:
+        lease = self._leases.get(key, None)
+        if lease is not None and lease.expires <= time.time():
+            self.reclaim()
+            return None
+        return lease
+
+    def holder(self, key: Hashable) -> Any:
+        lease = self.lease(key)
+        return lease.holder if lease else None
+
+    def acquire(
+        self, key: Hashable, holder: Any, ttl: Optional[float] = None
+    ) -> Optional[int]:
+        """Take the lock for ttl seconds, returns its token, None if already held"""
+        if self.lease(key) is not None:
+            self.contended += 1
+            return None
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        self._seq += 1
+        self._leases[key] = Lease(holder, expires, self._seq)
+        heapq.heappush(self._heap, (expires, self._seq, key))
+        self.acquired += 1
+        return self._seq
+
+    def release(self, key: Hashable, token: Optional[int]) -> bool:
+        """Release the lease acquire returned token for, no-op for any other"""
+        lease = self._leases.get(key, None)
+        if lease is None or lease.token != token:
+            return False
+        del self._leases[key]
+        self.released += 1
+        return True
+
+    def reclaim(self, now: Optional[float] = None) -> int:
+        """Drop every lease past its expiry, returns how many were dropped"""
+        now = time.time() if now is None else now
+        dropped = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, token, key = heapq.heappop(self._heap)
+            lease = self._leases.get(key, None)
+            # a released and re-acquired key has a newer lease, keep it
+            if lease is not None and lease.token == token:
+                del self._leases[key]
+                dropped += 1
+        self.expired += dropped
+        return dropped
+
+    def items(self) -> List[Tuple[Hashable, Lease]]:
+        self.reclaim()
+        return list(self._leases.items())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "held": len(self),
+            "acquired": self.acquired,
+            "released": self.released,
+            "expired": self.expired,
+            "contended": self.contended,
+        }
+
+
+class KeyedLocks:
+    """
+    asyncio locks created per key on demand
+
+    Holders of one key run one at a time while different keys never wait on
+    each other. A lock is dropped as soon as nobody holds or waits on it, so
+    idle keys cost nothing. The locks are not reentrant, take them once at the
+    outermost caller.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._locks: Dict[Hashable, List[Any]] = {}  # key -> [asyncio.Lock, users]
+        self.acquired = 0
+        self.contended = 0  # acquires that had to wait
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def locked(self, key: Hashable) -> bool:
+        entry = self._locks.get(key, None)
+        return entry is not None and entry[0].locked()
+
+    @asynccontextmanager
+    async def __call__(self, *keys: Hashable) -> AsyncIterator[None]:
+        """Hold every key, taken in sorted order so two holders can't deadlock"""
+        held = []
+        try:
+            for key in sorted(set(keys), key=str):
+                await self._acquire(key)
+                held.append(key)
+            yield
+        finally:
+            for key in reversed(held):
+                self._locks[key][0].release()
+                self._drop(key)
+
+    async def _acquire(self, key: Hashable) -> None:
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        if entry[0].locked():
+            self.contended += 1
+        start = time.perf_counter()
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self._drop(key)
+            raise
+        wait = time.perf_counter() - start
+        self.acquired += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._locks[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._locks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "held": len(self),
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "wait_avg_ms": round(self.wait_total / max(self.acquired, 1) * 1000, 3),
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
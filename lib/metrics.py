@@ -0,0 +1,141 @@
+import bisect
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class Histogram:
+    """Cumulative latency histogram with fixed upper bounds in seconds"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, count) pairs in the Prometheus bucket layout"""
+        result, seen = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            result.append((f"{bound:g}", seen))
+        result.append(("+Inf", self.count))
+        return result
+
+
+class CommandMetrics:
+    """Latency histogram and error count of every app command"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.latency: Dict[str, Histogram] = {}
+        self.errors: Dict[str, int] = {}
+
+    def observe(self, command: str, seconds: float, failed: bool = False) -> None:
+        histogram = self.latency.get(command, None)
+        if histogram is None:
+            histogram = self.latency[command] = Histogram(self.buckets)
+        histogram.observe(seconds)
+        if failed:
+            self.errors[command] = self.errors.get(command, 0) + 1
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """One row per command, slowest p95 first"""
+        rows = [
+            {
+                "command": command,
+                "count": h.count,
+                "errors": self.errors.get(command, 0),
+                "avg": h.sum / h.count,
+                "p50": h.quantile(0.5),
+                "p95": h.quantile(0.95),
+                "max": h.max,
+            }
+            for command, h in self.latency.items()
+        ]
+        return sorted(rows, key=lambda row: row["p95"], reverse=True)
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+
+def render_prometheus(
+    commands: CommandMetrics,
+    stores: Dict[str, Dict[str, Any]],
+    caches: Dict[str, Dict[str, Any]],
+    prefix: str = "dungeon",
+) -> str:
+    """
+    Metrics in the Prometheus text exposition format
+
+    Parameters
+    ----------
+    commands: CommandMetrics - app command latencies
+    stores: Dict[str, Dict[str, Any]] - store name to its numeric counters
+    caches: Dict[str, Dict[str, Any]] - cache name to its `stats()`
+    prefix: str - metric name prefix
+    """
+    lines = [
+        f"# HELP {prefix}_command_seconds App command latency without view waits.",
+        f"# TYPE {prefix}_command_seconds histogram",
+    ]
+    for command, h in sorted(commands.latency.items()):
+        for le, count in h.cumulative():
+            labels = _labels(command=command, le=le)
+            lines.append(f"{prefix}_command_seconds_bucket{{{labels}}} {count}")
+        labels = _labels(command=command)
+        lines.append(f"{prefix}_command_seconds_sum{{{labels}}} {h.sum:.6f}")
+        lines.append(f"{prefix}_command_seconds_count{{{labels}}} {h.count}")
+    lines.append(f"# TYPE {prefix}_command_errors_total counter")
+    for command, count in sorted(commands.errors.items()):
+        lines.append(
+            f"{prefix}_command_errors_total{{{_labels(command=command)}}} {count}"
+        )
+
+    lines.extend(_family(f"{prefix}_store", "store", stores))
+    lines.extend(_family(f"{prefix}_cache", "cache", caches))
+    return "\n".join(lines) + "\n"
+
+
+def _family(name: str, label: str, groups: Dict[str, Dict[str, Any]]) -> Iterable[str]:
+    """One gauge per numeric field, labelled with the group it belongs to"""
+    fields: Dict[str, List[str]] = {}
+    for group, values in sorted(groups.items()):
+        for field, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            fields.setdefault(field, []).append(
+                f"{name}_{field}{{{_labels(**{label: group})}}} {value}"
+            )
+    for field, samples in fields.items():
+        yield f"# TYPE {name}_{field} gauge"
+        yield from samples
+
+
+def format_table(rows: List[Dict[str, Any]], limit: Optional[int] = None) -> str:
+    """Command summary as fixed width text for a code block"""
+    lines = [f"{'command':<20}{'count':>7}{'err':>5}{'avg':>9}{'p95':>9}{'max':>9}"]
+    for row in rows[:limit]:
+        lines.append(
+            f"{row['command'][:20]:<20}{row['count']:>7,}{row['errors']:>5,}"
+            f"{row['avg'] * 1000:>7.1f}ms{row['p95'] * 1000:>7.0f}ms"
+            f"{row['max'] * 1000:>7.0f}ms"
+        )
+    return "\n".join(lines)
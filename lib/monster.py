@@ -1,29 +1,105 @@
+import math
 import random
-from typing import Optional
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
 
 from .base import MonsterInfo
 from .entity import Entity
 
+_STATS = 4  # vit, dex, sta, mys
+_DROPLESS = 37  # empty entries mixed into a normal monster's drop pool
+
+
+@lru_cache(maxsize=None)
+def _binomial_cdf(n: int, p: float) -> Tuple[float, ...]:
+    """Cumulative binomial distribution, built once per (n, p)"""
+    if p >= 1:
+        return (0.0,) * n + (1.0,)
+    log_p, log_q = math.log(p), math.log1p(-p)
+    cdf, total = [], 0.0
+    for k in range(n + 1):
+        total += math.exp(
+            math.lgamma(n + 1)
+            - math.lgamma(k + 1)
+            - math.lgamma(n - k + 1)
+            + k * log_p
+            + (n - k) * log_q
+        )
+        cdf.append(total)
+    return tuple(cdf)
+
+
+def _binomial(n: int, p: float) -> int:
+    if n <= 0:
+        return 0
+    if hasattr(random, "binomialvariate"):  # python 3.12+
+        return random.binomialvariate(n, p)
+    return min(bisect_right(_binomial_cdf(n, p), random.random()), n)
+
+
+def roll_points(points: int, buckets: int = _STATS) -> List[int]:
+    """
+    Spread points uniformly at random over buckets with one multinomial draw
+
+    Same distribution as adding one point to a random bucket points times,
+    done as a chain of binomial draws so the cost does not grow with points.
+    """
+    result = []
+    for i in range(buckets - 1):
+        drawn = _binomial(points, 1 / (buckets - i))
+        result.append(drawn)
+        points -= drawn
+    result.append(points)
+    return result
+
+
+class MonsterPrototype(NamedTuple):
+    """Everything about a spawn that does not depend on its rolls"""
+
+    name: str
+    description: str
+    base: int  # starting value of every stat
+    drops: Tuple[str, ...]
+    drop_pool: Tuple[Union[str, bool], ...]
+
+
+_prototypes: Dict[Tuple[str, int, bool], MonsterPrototype] = {}
+
+
+def prototype(info: MonsterInfo, level: int, elite: bool) -> MonsterPrototype:
+    key = (info.name, level, elite)
+    proto = _prototypes.get(key, None)
+    if proto is None:
+        drops = tuple(info.drop)
+        proto = _prototypes[key] = MonsterPrototype(
+            name=info.name,
+            description=info.description,
+            base=max(int(level * 0.6), 1),
+            drops=drops,
+            drop_pool=drops if elite else (*drops, *[False] * _DROPLESS),
+        )
+    return proto
+
 
 class Monster(Entity):
     def __init__(
         self, *, info: MonsterInfo, level: int = 1, elite: Optional[bool] = None
     ):
         super().__init__(data={})  # no data needed
+        self.level = level
         self.elite = random.random() < 0.1 if elite is None else elite
 
-        # MonsterInfo
-        self.name = info.name
-        self.description = info.description
-        drops = info.drops
+        proto = prototype(info, level, self.elite)
+        self.name = proto.name
+        self.description = proto.description
 
         # stats
-        stats = [max(int(self.level * 0.6), 1)] * 4
-        for _ in range(self.level):
-            stats[random.randrange(len(stats))] += 1
+        stats = [proto.base + v for v in roll_points(self.level)]
         if self.elite:
             stats[random.randrange(len(stats))] *= 1.2
         self.vit, self.dex, self.sta, self.mys = stats
+        self.health = self._max_health
         # prefix
         if self.elite:
             top_stat = max([self.vitality, self.dexterity, self.stamina, self.mystic])
@@ -36,6 +112,4 @@ class Monster(Entity):
             elif top_stat == self.mystic:
                 prefix = "神秘的"
             self.name = f"{prefix}{self.name}"
-            self.drop = random.choice(drops)
-        else:
-            self.drop = random.choice([*drops, *[False] * 37])
+        self.drop = random.choice(proto.drop_pool)
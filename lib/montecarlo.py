@@ -0,0 +1,353 @@
+"""
+Vectorized Monte Carlo raid simulator for balance tuning
+
+Needs numpy, which the bot itself does not, so this module is not imported
+by the package and should be imported lazily where it is used. Every raid
+of a batch runs side by side as one row of the arrays, the rules follow
+`combat._simulate` but the random draws do not, results are comparable
+statistically and not roll for roll.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .constant import FIBONACCI
+
+_FIB = np.array(FIBONACCI, dtype=np.float64)
+_JOBS = ("novice", "paladin", "berserker", "rogue", "wizard", "bishop")
+NOVICE, PALADIN, BERSERKER, ROGUE, WIZARD, BISHOP = range(len(_JOBS))
+
+
+@dataclass
+class BatchReport:
+    """Aggregated results of one batch, every raid against the same level"""
+
+    spawn_level: int
+    runs: int
+    wins: int
+    unfinished: int  # raids cut off at the round limit
+    rounds: Dict[int, int] = field(default_factory=dict)  # rounds -> raids
+    damage_share: Dict[str, float] = field(default_factory=dict)  # per job
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.runs if self.runs else 0.0
+
+    @property
+    def mean_rounds(self) -> float:
+        total = sum(self.rounds.values())
+        return sum(k * v for k, v in self.rounds.items()) / total if total else 0.0
+
+
+def _int(x: np.ndarray) -> np.ndarray:
+    """`int()` of python, truncates towards zero"""
+    return np.trunc(x).astype(np.int64)
+
+
+def _derive(s: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """`Entity` properties the engine reads, computed on whole arrays"""
+    vitality = np.maximum(
+        _int(np.round(s["vit"] * s["vit_mod"] - s["mys"] / 100, 4) + s["e_vit"]), 0
+    )
+    dexterity = np.maximum(
+        _int(np.round(s["dex"] * s["dex_mod"] - s["sta"] / 100, 4) + s["e_dex"]), 0
+    )
+    stamina = np.maximum(
+        _int(np.round(s["sta"] * s["sta_mod"] - s["dex"] / 100, 4) + s["e_sta"]), 0
+    )
+    mystic = np.maximum(
+        _int(np.round(s["mys"] * s["mys_mod"] - s["vit"] / 100, 4) + s["e_mys"]), 0
+    )
+    luck = np.maximum(_int(s["luk"] * s["luk_mod"]) + s["e_luk"], 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accuracy = np.round(
+            dexterity * 100 / ((vitality + mystic) * 1.6 + dexterity * 0.2), 4
+        )
+    accuracy = np.nan_to_num(accuracy)
+    physical = vitality >= mystic
+    main = np.where(physical, vitality, mystic)
+    low = _int(np.minimum(main * accuracy, main * 0.9))
+    high = _int(np.maximum(main * accuracy, main * 1.1))
+    return {
+        "agility": np.round(s["speed"] + dexterity, 4),
+        "critical_chance": np.round(luck * accuracy / 100, 4),
+        "tenacity": _int(stamina / 2),
+        "physical": physical,
+        "low": low,
+        "high": high,
+        "dexterity": dexterity,
+        "stamina": stamina,
+        "mystic": mystic,
+    }
+
+
+def _stats(records: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Stat arrays from `combat.snapshot` style records"""
+    defaults = {
+        "vit": 3,
+        "dex": 3,
+        "sta": 3,
+        "mys": 3,
+        "luk": 5,
+        "vit_mod": 1.0,
+        "dex_mod": 1.0,
+        "sta_mod": 1.0,
+        "mys_mod": 1.0,
+        "luk_mod": 1.0,
+        "speed": 75,
+        "level": 1,
+        "health": 0,
+        "remain_stat": 0,
+    }
+    stats = {
+        k: np.array([r.get(k, v) for r in records], dtype=np.float64)
+        for k, v in defaults.items()
+    }
+    for k in ("vit", "dex", "sta", "mys", "luk"):
+        stats[f"e_{k}"] = np.array(
+            [r.get("equip_stats", {}).get(k, 0) for r in records], dtype=np.int64
+        )
+    stats["job"] = np.array(
+        [_JOBS.index(r.get("job", "novice")) for r in records], dtype=np.int64
+    )
+    return stats
+
+
+def _monsters(rng: np.random.Generator, level: int, runs: int) -> Dict[str, Any]:
+    """Roll `runs` monsters the way `Monster.__init__` does"""
+    base = max(int(level * 0.6), 1)
+    stats = base + rng.multinomial(level, [0.25] * 4, size=runs).astype(np.float64)
+    elite = rng.random(runs) < 0.1
+    boosted = rng.integers(0, 4, size=runs)
+    stats[elite, boosted[elite]] *= 1.2
+    zeros = np.zeros(runs, dtype=np.int64)
+    ones = np.ones(runs)
+    monster = {
+        "vit": stats[:, 0],
+        "dex": stats[:, 1],
+        "sta": stats[:, 2],
+        "mys": stats[:, 3],
+        "luk": np.full(runs, 5.0),
+        "vit_mod": ones.copy(),
+        "dex_mod": ones.copy(),
+        "sta_mod": ones.copy(),
+        "mys_mod": ones.copy(),
+        "luk_mod": ones.copy(),
+        "speed": np.full(runs, 75.0),
+        **{f"e_{k}": zeros for k in ("vit", "dex", "sta", "mys", "luk")},
+    }
+    derived = _derive(monster)
+    max_health = _int(level + derived["stamina"] + max(level / 10, 1) * 50)
+    bonus = np.where(elite, FIBONACCI[int(level / 10) + 1], FIBONACCI[int(level / 10)])
+    monster["health"] = max_health + bonus
+    return monster
+
+
+def simulate_batch(
+    party: List[Dict[str, Any]],
+    spawn_level: int,
+    runs: int = 1000,
+    seed: Optional[int] = None,
+    max_rounds: int = 500,
+) -> BatchReport:
+    """
+    Run `runs` raids of the same party against freshly rolled monsters
+
+    Parameters
+    ----------
+    party: List[Dict[str, Any]] - participant records from `combat.snapshot`
+    spawn_level: int - level of every monster in the batch
+    runs: int - number of raids
+    seed: Optional[int] - seed of the numpy generator
+    max_rounds: int - raids still going after this many rounds are cut off
+    """
+    rng = np.random.default_rng(seed)
+    p = _stats(party)
+    pd = _derive(p)
+    job = p["job"]
+    n = len(party)
+    rows = np.arange(runs)
+
+    mob = _monsters(rng, spawn_level, runs)
+    md = _derive(mob)
+    m_health = mob["health"].astype(np.int64)
+    mhp = m_health.copy()
+    health = _int(p["health"])
+    hp = np.tile(health, (runs, 1))
+    damage = np.zeros((runs, n), dtype=np.float64)
+    # turn order is fixed at the start, the monster is the last entry
+    agility = np.concatenate(
+        [np.tile(pd["agility"], (runs, 1)), md["agility"][:, None]], 1
+    )
+    order = np.argsort(-agility, axis=1, kind="stable")
+    mob_agility = md["agility"].copy()  # hit chance uses the starting agility
+    active = np.ones(runs, dtype=bool)
+    won = np.zeros(runs, dtype=bool)
+    rounds = np.zeros(runs, dtype=np.int64)
+
+    for round_cnt in range(1, max_rounds + 1):
+        wiped = active & (hp.sum(axis=1) <= 0)
+        active &= ~wiped
+        if not active.any():
+            break
+        rounds[active] = round_cnt
+        for slot in range(n + 1):
+            actor = order[:, slot]
+            is_mob = actor == n
+            a = np.minimum(actor, n - 1)
+            turn = active & ~is_mob & (mhp > 0) & (hp[rows, a] > 0)
+            if turn.any():
+                _player_turn(
+                    rng, turn, a, p, pd, job, hp, mhp, m_health, damage, md, mob_agility
+                )
+            turn = active & is_mob & (mhp > 0)
+            if turn.any():
+                for target_slot in range(n + 1):
+                    t = order[:, target_slot]
+                    hit = turn & (t != n) & (mhp > 0)
+                    t = np.minimum(t, n - 1)
+                    hit &= hp[rows, t] > 0
+                    if hit.any():
+                        _mob_turn(rng, hit, t, p, pd, job, hp, mhp, damage, md)
+        done = active & (mhp <= 0)
+        won |= done & (hp.sum(axis=1) > 0)
+        active &= ~done
+        if not active.any():
+            break
+        for k, step in (
+            ("vit_mod", 0.8),
+            ("dex_mod", 0.4),
+            ("mys_mod", 0.8),
+            ("sta_mod", 0.6),
+        ):
+            mob[k] = np.where(active, mob[k] + step * round_cnt, mob[k])
+        md = _derive(mob)
+
+    total = damage.sum()
+    share = Counter()
+    for i in range(n):
+        share[_JOBS[job[i]]] += damage[:, i].sum()
+    return BatchReport(
+        spawn_level=spawn_level,
+        runs=runs,
+        wins=int(won.sum()),
+        unfinished=int(active.sum()),
+        rounds={int(k): int(v) for k, v in zip(*np.unique(rounds, return_counts=True))},
+        damage_share={k: float(v / total) if total else 0.0 for k, v in share.items()},
+    )
+
+
+def _player_turn(rng, turn, a, p, pd, job, hp, mhp, m_health, damage, md, mob_agility):
+    rows = np.nonzero(turn)[0]
+    a = a[rows]
+    j = job[a]
+    cur = hp[rows, a]
+    perc = cur / p["health"][a]
+    u = rng.random((9, len(rows)))
+
+    berserk = np.zeros(len(rows), dtype=bool)
+    missed = pd["agility"][a] / mob_agility[rows] <= u[0]
+    rogue_pass = (j == ROGUE) & (
+        u[1] <= np.maximum(0.5, 0.3 + 1000 / (pd["agility"][a] + 1000))
+    )
+    berserk_pass = (j == BERSERKER) & (u[1] <= 0.3 + (1 - perc) * 0.5)
+    berserk |= missed & ~rogue_pass & berserk_pass & (j != BISHOP)
+    hits = ~missed | (j == BISHOP) | rogue_pass | berserk_pass
+    rows, a, j, cur, perc, u, berserk = (
+        rows[hits],
+        a[hits],
+        j[hits],
+        cur[hits],
+        perc[hits],
+        u[:, hits],
+        berserk[hits],
+    )
+
+    crit = np.where(
+        u[2] * 100 < pd["critical_chance"][a], np.where(j == ROGUE, 1.8, 1.5), 1
+    )
+    roll = rng.integers(pd["low"][a], pd["high"][a] + 1)
+    dealt = np.maximum(_int(roll * crit - md["tenacity"][rows]), 0)
+
+    rogue = (j == ROGUE) & (u[3] <= 0.3)
+    hits_cnt = np.maximum(
+        np.searchsorted(_FIB, u[4] * pd["dexterity"][a], side="right"), 1
+    )
+    sneak = _int(dealt / 3.8 + (m_health[rows] - mhp[rows]) * 0.01) * hits_cnt
+    berserk = ~rogue & (
+        berserk | ((j == BERSERKER) & (u[5] <= 0.3 + (1 - perc) * 0.5) & (dealt != 0))
+    )
+    frenzy = _int(pd["high"][a] * 5.28 * (1 - perc) * 2.69)
+    wizard = ~rogue & ~berserk & (j == WIZARD) & (u[6] <= 0.5) & (dealt != 0)
+    element = _int(dealt * 3.14) + np.maximum(_int(mhp[rows] * 0.08), 1)
+    bishop = ~rogue & ~berserk & ~wizard & (j == BISHOP)
+    dealt = np.select(
+        [rogue, berserk, wizard, bishop], [sneak, frenzy, element, 1], dealt
+    )
+    hp[rows[berserk], a[berserk]] = np.maximum(_int(cur[berserk] / 2), 1)
+
+    mhp[rows] -= dealt
+    damage[rows, a] += dealt
+
+    # bishop prayers, judgement finishes the monster, a miracle heals the party
+    prayed = bishop & (u[7] < 0.2 + p["remain_stat"][a] / 200)
+    judgement = prayed & (u[8] < 0.01)
+    damage[rows[judgement], a[judgement]] += mhp[rows[judgement]] - 1
+    mhp[rows[judgement]] = 0
+    damage[rows[bishop & ~prayed], a[bishop & ~prayed]] -= 1
+    for r, i in zip(rows[prayed & ~judgement], a[prayed & ~judgement]):
+        alive = hp[r] != 0
+        heal = int(pd["mystic"][i] * p["level"][i] / alive.sum() / 5) - 1
+        damage[r, i] += int(heal / 2)
+        hp[r] = np.where(
+            alive, hp[r] + np.minimum(heal, _int(p["health"]) - hp[r]), hp[r]
+        )
+
+
+def _mob_turn(rng, hit, t, p, pd, job, hp, mhp, damage, md):
+    rows = np.nonzero(hit)[0]
+    t = t[rows]
+    j = job[t]
+    u = rng.random((7, len(rows)))
+    ratio = md["agility"][rows] / pd["agility"][t]
+    dodged = ~pd["physical"][t] & (np.minimum(ratio, 0.75) <= u[0])
+    dodged |= ratio <= u[1]
+    dodged |= (j == ROGUE) & (
+        u[2] <= np.maximum(0.5, 0.3 + 1000 / (md["agility"][rows] + 1000))
+    )
+    dodged |= (j == BISHOP) & (u[3] < np.minimum(0.2 + p["remain_stat"][t] / 500, 0.8))
+    rows, t, j, u = rows[~dodged], t[~dodged], j[~dodged], u[:, ~dodged]
+
+    crit = np.where(u[4] * 100 < md["critical_chance"][rows], 1.5, 1)
+    roll = rng.integers(md["low"][rows], md["high"][rows] + 1)
+    dealt = np.maximum(_int(roll * crit - pd["tenacity"][t]), 0)
+    cur = hp[rows, t]
+    rage = (j == BERSERKER) & (dealt != 0) & (u[5] <= 0.8)
+    endure = rage & (cur != 1) & (dealt > cur)
+    dealt = np.where(endure, cur - 1, np.where(rage, _int(dealt * 2.5), dealt))
+    cur = cur - np.minimum(dealt, cur)
+
+    block = (j == PALADIN) & (dealt != 0)
+    thorn = _int(dealt * 0.27) + pd["stamina"][t]
+    deflect = _int(np.minimum(thorn * 2.4, cur))
+    cur = np.where(block, cur - np.minimum(deflect, cur), cur)
+    hp[rows, t] = cur
+    bash = block & (u[6] < 0.7)
+    mhp[rows[bash]] -= np.minimum(thorn[bash], mhp[rows[bash]])
+    damage[rows[bash], t[bash]] += thorn[bash]
+
+
+def sweep(
+    party: List[Dict[str, Any]],
+    levels: Iterable[int],
+    runs: int = 1000,
+    seed: Optional[int] = None,
+) -> List[BatchReport]:
+    """`simulate_batch` for every spawn level, e.g. to find where a party stops winning"""
+    rng = np.random.default_rng(seed)
+    return [
+        simulate_batch(party, level, runs, int(rng.integers(2**32)))
+        for level in levels
+    ]
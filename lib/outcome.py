@@ -0,0 +1,63 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .guild import Guild
+from .item import Item
+from .player import Player
+
+
+@dataclass
+class PlayerDelta:
+    """Changes a raid makes to one participant, applied on the latest record."""
+
+    exp: int = 0
+    chest: int = 0
+    monster_cnt: int = 0
+    cum_dmg: int = 0
+    max_dmg: int = 0
+    soulstone: int = 0
+    petty: Optional[int] = None  # absolute value, None keeps the current one
+
+    def apply(self, player: Player) -> int:
+        """Apply delta to player, returns the number of levels gained"""
+        player.chest += self.chest
+        player.monster_cnt += self.monster_cnt
+        player.cum_dmg += self.cum_dmg
+        player.max_dmg = max(player.max_dmg, self.max_dmg)
+        player.soulstone += self.soulstone
+        if self.petty is not None:
+            player.petty = self.petty
+        player.add_exp(self.exp)
+        return player._check_levelup()
+
+
+@dataclass
+class WorldDelta:
+    """Changes a raid makes to its world, applied on the latest record."""
+
+    monster_cnt: int = 0
+    exp: int = 0
+    result: Optional[bool] = None  # win or loss, moves the spawn level
+    seen: int = 0
+
+    def apply(self, world: Guild) -> int:
+        """Apply delta to world, returns the number of levels gained"""
+        world.monster_cnt += self.monster_cnt
+        world.add_exp(self.exp)
+        levelup = world.check_levelup()
+        if self.result is not None:
+            world.submit_result(self.result)
+        world.seen = max(world.seen, self.seen)
+        return levelup
+
+
+@dataclass
+class RaidOutcome:
+    """Everything a finished raid persists, committed as one batch."""
+
+    guild_id: int
+    world: WorldDelta = field(default_factory=WorldDelta)
+    players: Dict[str, PlayerDelta] = field(default_factory=dict)
+    drops: List[Tuple[str, Item]] = field(default_factory=list)  # (user_id, item)
+    raid_id: Optional[str] = None
+    record: Optional[Dict[str, Any]] = None  # replay record, see `record_raid`
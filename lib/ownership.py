@@ -0,0 +1,142 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from .equipment import SLOTS
+
+
+class ItemOwner(NamedTuple):
+    owner: str  # user id
+    slot: str  # equipped slot, empty while in the backpack
+    template: str  # catalog key, item name for legacy items
+
+
+class OwnershipIndex:
+    """
+    item id -> owner of every stored item
+
+    Fed by writes to the inventory and player stores, so ownership checks
+    and admin lookups never scan every user. Items stored in an inventory
+    but missing from the player's list are orphans, ids listed by the player
+    without a stored item are dangling, and an id stored under two users at
+    once is a duplicate.
+    """
+
+    def __init__(self):
+        self._owners: Dict[str, str] = {}
+        self._templates: Dict[str, str] = {}
+        self._stored: Dict[str, Set[str]] = {}  # user id -> stored item ids
+        self._listed: Dict[str, Set[str]] = {}  # user id -> Player.inventory
+        self._equipped: Dict[str, Dict[str, str]] = {}  # user id -> item -> slot
+        self.duplicates: Dict[str, Set[str]] = {}  # item id -> every owner
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._owners
+
+    @staticmethod
+    def _template(record: Any) -> str:
+        if not isinstance(record, dict):
+            return ""
+        return record.get("template", "") or record.get("name", "")
+
+    def build(self, players: Dict[str, dict], inventories: Dict[str, dict]) -> None:
+        """Rebuild the whole index from both stores"""
+        for mapping in (
+            self._owners,
+            self._templates,
+            self._stored,
+            self._listed,
+            self._equipped,
+            self.duplicates,
+        ):
+            mapping.clear()
+        for user_id, inventory in inventories.items():
+            self.update_inventory(user_id, inventory)
+        for user_id, record in players.items():
+            self.update_player(user_id, record)
+
+    def update_inventory(self, user_id: Any, inventory: Optional[dict]) -> None:
+        """Index one user's stored items, a None inventory removes them"""
+        user_id = str(user_id)
+        items = set(inventory) if isinstance(inventory, dict) else set()
+        old = self._stored.get(user_id, set())
+        for item_id in old - items:
+            self._release(item_id, user_id)
+        for item_id in items - old:
+            self._claim(item_id, user_id)
+        for item_id in items:
+            self._templates[item_id] = self._template(inventory[item_id])
+        if items:
+            self._stored[user_id] = items
+        else:
+            self._stored.pop(user_id, None)
+
+    def update_player(self, user_id: Any, record: Optional[dict]) -> None:
+        """Track the inventory list and equipped slots of one player"""
+        user_id = str(user_id)
+        if not isinstance(record, dict):
+            self._listed.pop(user_id, None)
+            self._equipped.pop(user_id, None)
+            return
+        self._listed[user_id] = set(record.get("inventory", []))
+        self._equipped[user_id] = {
+            record[slot]: slot for slot in SLOTS if record.get(slot, "")
+        }
+
+    def _claim(self, item_id: str, user_id: str) -> None:
+        owner = self._owners.get(item_id, None)
+        if owner is not None and owner != user_id:
+            self.duplicates.setdefault(item_id, {owner}).add(user_id)
+        self._owners[item_id] = user_id
+
+    def _release(self, item_id: str, user_id: str) -> None:
+        owners = self.duplicates.get(item_id, None)
+        if owners is not None:
+            owners.discard(user_id)
+            if len(owners) < 2:
+                del self.duplicates[item_id]
+            if self._owners.get(item_id, None) == user_id and owners:
+                self._owners[item_id] = next(iter(owners))
+            return
+        if self._owners.get(item_id, None) == user_id:
+            del self._owners[item_id]
+            self._templates.pop(item_id, None)
+
+    def owner(self, item_id: str) -> Optional[ItemOwner]:
+        user_id = self._owners.get(item_id, None)
+        if user_id is None:
+            return None
+        return ItemOwner(
+            user_id,
+            self._equipped.get(user_id, {}).get(item_id, ""),
+            self._templates.get(item_id, ""),
+        )
+
+    def owns(self, user_id: Any, item_id: str) -> bool:
+        return item_id in self._stored.get(str(user_id), ())
+
+    def items(self, user_id: Any) -> Set[str]:
+        return set(self._stored.get(str(user_id), ()))
+
+    def orphans(self, user_id: Any) -> Set[str]:
+        """Stored items the player doesn't list"""
+        user_id = str(user_id)
+        return self._stored.get(user_id, set()) - self._listed.get(user_id, set())
+
+    def dangling(self, user_id: Any) -> Set[str]:
+        """Listed or equipped ids with no stored item"""
+        user_id = str(user_id)
+        referenced = self._listed.get(user_id, set()) | set(
+            self._equipped.get(user_id, {})
+        )
+        return referenced - self._stored.get(user_id, set())
+
+    def inconsistent(self) -> List[Tuple[str, Set[str], Set[str]]]:
+        """(user id, orphans, dangling) of every user whose stores disagree"""
+        result = []
+        for user_id in self._stored.keys() | self._listed.keys():
+            orphans, dangling = self.orphans(user_id), self.dangling(user_id)
+            if orphans or dangling:
+                result.append((user_id, orphans, dangling))
+        return result
@@ -4,13 +4,44 @@ from discord import Colour
 
 from .constant import CHARACTER_LEVEL_LIMIT
 from .entity import Entity
+from .progression import player_exp_required, resolve_levels
+
+# record fields read by the derived combat stats shown on player sheets
+COMBAT_FIELDS = (
+    "vit",
+    "dex",
+    "sta",
+    "mys",
+    "luk",
+    "vit_mod",
+    "dex_mod",
+    "sta_mod",
+    "mys_mod",
+    "luk_mod",
+    "equip_stats",
+    "level",
+    "health",
+)
+
+# stat names players allocate points with -> Player attribute
+STAT_ALIASES = {
+    "str": "vit",
+    "力量": "vit",
+    "dex": "dex",
+    "敏捷": "dex",
+    "con": "sta",
+    "體質": "sta",
+    "wis": "mys",
+    "智慧": "mys",
+}
 
 
 class Player(Entity):
     def __init__(self, *, data: dict = {}):
         super().__init__(data=data)
 
-        self.blessing = data.get("blessing", [])
+        # lists are copied, a Player never shares them with a stored record
+        self.blessing = list(data.get("blessing", []))
 
         # equips
         self.head = data.get("head", "")
@@ -32,7 +63,7 @@ class Player(Entity):
         # data
         self.health = data.get("health", 0)
         self.exp = data.get("exp", 0)
-        self.remain_stat = data.get("remain_stat", {})
+        self.remain_stat = data.get("remain_stat", 0)
         # self.job = data.get("job", "novice")
 
         self.monster_cnt = data.get("monster_cnt", 0)
@@ -40,7 +71,7 @@ class Player(Entity):
         self.cum_dmg = data.get("cum_dmg", 0)
 
         self.allowed_inventory = data.get("allowed_inventory", 20)
-        self.inventory = data.get("inventory", [])  # list of item uuid
+        self.inventory = list(data.get("inventory", []))  # list of item uuid
         self.chest = data.get("chest", 0)  # loot from killed monsters
         self.soulstone = data.get("soulstone", 0)
 
@@ -70,7 +101,7 @@ class Player(Entity):
             "sta_mod": self.sta_mod,
             "mys_mod": self.mys_mod,
             "luk_mod": self.luk_mod,
-            "blessing": self.blessing,
+            "blessing": list(self.blessing),
             "head": self.head,
             "necklace": self.necklace,
             "body": self.body,
@@ -89,7 +120,7 @@ class Player(Entity):
             "max_dmg": self.max_dmg,
             "cum_dmg": self.cum_dmg,
             "allowed_inventory": self.allowed_inventory,
-            "inventory": self.inventory,
+            "inventory": list(self.inventory),
             "chest": self.chest,
             "soulstone": self.soulstone,
             "status": self.status,
@@ -104,28 +135,18 @@ class Player(Entity):
         """
         Get exp required to level up
         """
-        return round(
-            pow(level, 7) * 0.000000005
-            + pow(level, 6) * 0.0000008
-            + pow(level, 5) * 0.000018
-            + pow(level, 4) * 0.0012
-            + pow(level, 3) * 0.6
-            + pow(level, 2) * 1.5
-            + level * 12.2
-        )
+        return player_exp_required(level)
 
-    def _check_levelup(self) -> bool:
+    def _check_levelup(self) -> int:
         """
-        Checks player exp for leveling
+        Checks player exp for leveling, returns the number of levels gained
         """
-        if self.level == CHARACTER_LEVEL_LIMIT:
-            return False
-            if self.exp >= self.exp_required(self.level):
-                self.level += 1
-                self.exp = 0
-                self.remain_stat += 3
-                return True
-            return False
+        level = self.level
+        self.level, self.exp = resolve_levels(
+            level, self.exp, player_exp_required, CHARACTER_LEVEL_LIMIT
+        )
+        self.remain_stat += 3 * (self.level - level)
+        return self.level - level
 
     def add_exp(self, exp: int) -> None:
         """
@@ -0,0 +1,78 @@
+from bisect import bisect_right
+from typing import Callable, Tuple
+
+from .constant import CHARACTER_LEVEL_LIMIT, FIBONACCI, WORLD_LEVEL_LIMIT
+
+
+def _player_curve(level: int) -> int:
+    return round(
+        pow(level, 7) * 0.000000005
+        + pow(level, 6) * 0.0000008
+        + pow(level, 5) * 0.000018
+        + pow(level, 4) * 0.0012
+        + pow(level, 3) * 0.6
+        + pow(level, 2) * 1.5
+        + level * 12.2
+    )
+
+
+def _world_curve(level: int) -> int:
+    return round(
+        22.069 * pow(level, 7)
+        + 42.069 * pow(level, 5)
+        + 69.69 * pow(level, 4)
+        + 74.8 * pow(level, 3)
+        + 97.5 * pow(level, 2)
+        + 116.55 * (level)
+    )
+
+
+# exp needed to leave each level, monster levels use the player curve for world
+# exp and spawn levels reach world level * 10
+PLAYER_EXP: Tuple[int, ...] = tuple(
+    _player_curve(level)
+    for level in range(max(CHARACTER_LEVEL_LIMIT, WORLD_LEVEL_LIMIT * 10) + 1)
+)
+WORLD_EXP: Tuple[int, ...] = tuple(
+    _world_curve(level) for level in range(WORLD_LEVEL_LIMIT + 1)
+)
+
+
+def player_exp_required(level: int) -> int:
+    if 0 <= level < len(PLAYER_EXP):
+        return PLAYER_EXP[level]
+    return _player_curve(level)
+
+
+def world_exp_required(level: int) -> int:
+    if 0 <= level < len(WORLD_EXP):
+        return WORLD_EXP[level]
+    return _world_curve(level)
+
+
+def fib_index(n: float) -> int:
+    """Index of the first fibonacci number larger than n"""
+    return max(bisect_right(FIBONACCI, n), 1)
+
+
+def resolve_levels(
+    level: int, exp: int, required: Callable[[int], int], limit: int
+) -> Tuple[int, int]:
+    """
+    Apply every level up an exp total is enough for
+
+    Parameters
+    ----------
+    level: int - current level
+    exp: int - exp collected on the current level
+    required: Callable[[int], int] - exp needed to leave a level
+    limit: int - level cap, exp keeps piling up once reached
+
+    Returns
+    -------
+    Tuple[int, int] - new level and the exp left over on it
+    """
+    while level < limit and exp >= required(level):
+        exp -= required(level)
+        level += 1
+    return level, exp
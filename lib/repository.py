@@ -0,0 +1,160 @@
+import asyncio
+import time
+from contextlib import nullcontext
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger as log
+
+
+class WriteBehindStore:
+    """
+    `Config` compatible write-behind wrapper around another store
+
+    `put` only keeps the value in memory and marks the key dirty, a single
+    background task writes every dirty key at most once per `interval`
+    seconds. Call `flush` before shutting down.
+    """
+
+    def __init__(self, store: Any, interval: float = 5.0):
+        self.store = store
+        self.interval = interval
+        self._pending: Dict[str, Any] = {}
+        self._revisions: Dict[str, int] = {}  # bumped on every change of a key
+        self._task: Optional[asyncio.Task] = None
+        self.reads = 0
+        self.writes = 0  # rows written to the underlying store
+        self.puts = 0  # puts absorbed before reaching the store
+        # called with (key, value) on every change, value is None on removal
+        self.listeners: List[Callable[[str, Any], None]] = []
+
+    def __contains__(self, key: Any) -> bool:
+        return str(key) in self._pending or key in self.store
+
+    def __getitem__(self, key: Any) -> Any:
+        self.reads += 1
+        if str(key) in self._pending:
+            return self._pending[str(key)]
+        return self.store[key]
+
+    def __len__(self) -> int:
+        return len(self.all())
+
+    def get(self, key: Any, *args: Any) -> Any:
+        self.reads += 1
+        if str(key) in self._pending:
+            return self._pending[str(key)]
+        return self.store.get(key, *args)
+
+    def all(self) -> Dict[str, Any]:
+        if not self._pending:
+            return self.store.all()
+        return {**self.store.all(), **self._pending}
+
+    def revision(self, key: Any) -> int:
+        return self._revisions.get(str(key), 0)
+
+    async def put(self, key: Any, value: Any) -> None:
+        key = str(key)
+        self.puts += 1
+        self._revisions[key] = self._revisions.get(key, 0) + 1
+        self._pending[key] = value
+        self._notify(key, value)
+
+    async def put_many(self, values: Dict[Any, Any]) -> None:
+        """
+        Write several keys through at once, skipping the write-behind delay
+
+        Inside a transaction of the underlying database the new values only
+        become visible, bump their revision and reach the listeners once it
+        commits, a rollback leaves the store as it was.
+        """
+        values = {str(k): v for k, v in values.items()}
+        superseded = {k: self._pending.get(k, None) for k in values}
+        if hasattr(self.store, "put_many"):
+            await self.store.put_many(values)
+        else:
+            for key, value in values.items():
+                await self.store.put(key, value)
+        self._on_commit(partial(self._written, values, superseded))
+
+    def _written(self, values: Dict[str, Any], superseded: Dict[str, Any]) -> None:
+        for key, value in values.items():
+            if self._pending.get(key, None) is not superseded[key]:
+                continue  # put again meanwhile, that newer value stays pending
+            self._pending.pop(key, None)
+            self._revisions[key] = self._revisions.get(key, 0) + 1
+            self._notify(key, value)
+        self.writes += len(values)
+
+    async def remove(self, key: Any) -> None:
+        await self.store.remove(key)
+        self._on_commit(partial(self._removed, str(key)))
+
+    def _removed(self, key: str) -> None:
+        self._revisions[key] = self._revisions.get(key, 0) + 1
+        self._pending.pop(key, None)
+        self._notify(key, None)
+
+    def _on_commit(self, callback: Callable[[], None]) -> None:
+        database = getattr(self.store, "database", None)
+        if database is None:
+            callback()
+        else:
+            database.on_commit(callback)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self.store.all()),
+            "pending": len(self._pending),
+            "reads": self.reads,
+            "puts": self.puts,
+            "writes": self.writes,
+            "bytes_read": getattr(self.store, "bytes_read", 0),
+            "bytes_written": getattr(self.store, "bytes_written", 0),
+        }
+
+    def _notify(self, key: str, value: Any) -> None:
+        for listener in self.listeners:
+            listener(key, value)
+
+    async def flush(self) -> int:
+        """Write every dirty key once, returns the number of keys written"""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        database = getattr(self.store, "database", None)
+        try:
+            with database.transaction() if database is not None else nullcontext():
+                for key, value in pending.items():
+                    await self.store.put(key, value)
+        except BaseException:
+            # keep everything dirty for the next attempt
+            self._pending = {**pending, **self._pending}
+            raise
+        self.writes += len(pending)
+        return len(pending)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            sti = time.perf_counter()
+            try:
+                written = await self.flush()
+            except Exception as e:
+                log.error("Write-behind flush failed: {}", e)
+                continue
+            if written:
+                log.debug(
+                    "Flushed {} keys in {:.4f}s.", written, time.perf_counter() - sti
+                )
@@ -0,0 +1,139 @@
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from loguru import logger as log
+
+from .guild import Guild
+from .instance import InstanceHandler
+
+
+class RaidPhase(Enum):
+    RECRUITING = "recruiting"
+    LOCKED = "locked"
+    SIMULATING = "simulating"
+    SETTLING = "settling"
+    DONE = "done"
+
+
+@dataclass
+class RaidState:
+    """One raid owned by the scheduler, from the entrance message to settlement"""
+
+    guild_id: int
+    channel_id: int
+    handler: InstanceHandler
+    world: Guild
+    deadline: int  # end of recruiting
+    interaction: Any = None  # discord.Interaction that opened the raid
+    view: Any = None  # dungeon_view collecting participants
+    embed: Any = None  # entrance embed
+    lock: Optional[int] = None  # token of the world raid lock
+    phase: RaidPhase = RaidPhase.RECRUITING
+    started: float = field(default_factory=time.time)
+
+
+class Scheduler:
+    """
+    Single timer task for every delayed callback of the cog
+
+    Deadlines live in one min-heap, the task sleeps until the earliest one
+    and fires every callback that is due in one batch. Scheduling a key
+    again replaces its previous callback, replaced and cancelled entries are
+    skipped lazily when they reach the top of the heap.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._entries: Dict[Hashable, Tuple[int, Callable[[], Awaitable[Any]]]] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+        self.fired = 0
+        self.batches = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def schedule(
+        self, key: Hashable, when: float, callback: Callable[[], Awaitable[Any]]
+    ) -> None:
+        """Run callback at unix time when, replacing whatever key had before"""
+        seq = next(self._seq)
+        self._entries[key] = (seq, callback)
+        heapq.heappush(self._heap, (when, seq, key))
+        if self._wakeup is not None and self._heap[0][1] == seq:
+            self._wakeup.set()
+
+    def cancel(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the timer and wait for every callback still running to unwind"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        running = list(self._running)
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+    def _pop_due(
+        self, now: float
+    ) -> List[Tuple[Hashable, Callable[[], Awaitable[Any]]]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._heap)
+            entry = self._entries.get(key, None)
+            if entry is not None and entry[0] == seq:
+                del self._entries[key]
+                due.append((key, entry[1]))
+        return due
+
+    def _prune(self) -> None:
+        """Drop replaced or cancelled entries so the sleep targets a live deadline"""
+        while self._heap:
+            _, seq, key = self._heap[0]
+            entry = self._entries.get(key, None)
+            if entry is not None and entry[0] == seq:
+                break
+            heapq.heappop(self._heap)
+
+    async def _fire(
+        self, key: Hashable, callback: Callable[[], Awaitable[Any]]
+    ) -> None:
+        try:
+            await callback()
+        except Exception as e:
+            log.exception("Scheduled callback {} failed: {}", key, e)
+
+    async def _run(self) -> None:
+        while True:
+            due = self._pop_due(time.time())
+            if due:
+                self.batches += 1
+                self.fired += len(due)
+                for key, callback in due:
+                    task = asyncio.create_task(self._fire(key, callback))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+            self._prune()
+            timeout = max(self._heap[0][0] - time.time(), 0) if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
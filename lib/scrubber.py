@@ -0,0 +1,130 @@
+import bisect
+from collections import deque
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from .equipment import SLOTS
+
+
+class Issue(NamedTuple):
+    user_id: str
+    kind: str  # dangling, duplicate, broken_slot, orphan or over_capacity
+    detail: str
+    repaired: bool
+
+
+def check_player(
+    user_id: str, player: dict, inventory: Optional[dict]
+) -> Tuple[Optional[dict], List[Issue]]:
+    """
+    Compare a player record with its stored inventory
+
+    Only the player record is repaired, stored items are never deleted, so
+    anything that can't be fixed without losing an item is only reported.
+
+    Returns
+    -------
+    Tuple[Optional[dict], List[Issue]] - repaired copy of the record, None
+    when it needs no change, and every issue found
+    """
+    inventory = inventory or {}
+    issues: List[Issue] = []
+    fixed = dict(player)
+
+    listed: List[str] = []
+    for item_id in player.get("inventory", []):
+        if item_id not in inventory:
+            issues.append(Issue(user_id, "dangling", item_id, True))
+        elif item_id in listed:
+            issues.append(Issue(user_id, "duplicate", item_id, True))
+        else:
+            listed.append(item_id)
+
+    for slot in SLOTS:
+        item_id = player.get(slot, "")
+        if item_id and item_id not in inventory:
+            fixed[slot] = ""
+            issues.append(Issue(user_id, "broken_slot", f"{slot}: {item_id}", True))
+
+    allowed = player.get("allowed_inventory", 0)
+    for item_id in inventory:
+        if item_id in listed:
+            continue
+        # an unlisted item is given back while there is room for it
+        repaired = len(listed) < allowed
+        if repaired:
+            listed.append(item_id)
+        issues.append(Issue(user_id, "orphan", item_id, repaired))
+
+    if len(listed) > allowed:
+        issues.append(
+            Issue(user_id, "over_capacity", f"{len(listed)}/{allowed}", False)
+        )
+
+    fixed["inventory"] = listed
+    if not any(issue.repaired for issue in issues):
+        return None, issues
+    return fixed, issues
+
+
+class Scrubber:
+    """
+    Cursor over every user id for the background consistency check
+
+    Users are visited in id order a batch at a time, the cursor is the last
+    id checked so a pass resumes where it stopped after a restart. Ids are
+    sorted once per pass, users created mid-pass are seen by the next one.
+    """
+
+    def __init__(self, batch: int, cursor: str = ""):
+        self.batch = batch
+        self.cursor = cursor
+        self._keys: List[str] = []
+        self.passes = 0
+        self.scanned = 0
+        self.repaired = 0
+        self.reported = 0
+        self.issues: Deque[Issue] = deque(maxlen=50)  # latest issues found
+
+    def next_batch(self, keys: Callable[[], Iterable[Any]]) -> List[str]:
+        """Next user ids to check, empty once a pass is complete"""
+        if not self._keys:
+            self._keys = sorted(str(k) for k in keys())
+        start = bisect.bisect_right(self._keys, self.cursor)
+        batch = self._keys[start : start + self.batch]
+        if not batch:
+            self.passes += 1
+            self.cursor = ""
+            self._keys = []
+        return batch
+
+    def advance(self, user_id: str, issues: List[Issue]) -> None:
+        self.cursor = user_id
+        self.scanned += 1
+        for issue in issues:
+            if issue.repaired:
+                self.repaired += 1
+            else:
+                self.reported += 1
+            self.issues.append(issue)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "passes": self.passes,
+            "cursor": self.cursor or "-",
+            "progress": (
+                f"{bisect.bisect_right(self._keys, self.cursor)}/{len(self._keys)}"
+            ),
+            "scanned": self.scanned,
+            "repaired": self.repaired,
+            "reported": self.reported,
+        }
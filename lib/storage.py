@@ -0,0 +1,340 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from loguru import logger as log
+
+from .item import ItemCatalog
+
+_DUMP_OPTION = orjson.OPT_NON_STR_KEYS
+
+
+class SQLiteDatabase:
+    """
+    Single sqlite file in WAL mode shared by every store
+
+    Stores keep their rows in memory like `Config` does, a `put` only
+    writes the rows that belong to that key instead of the whole file.
+    The in-memory rows follow the database, they change once the write
+    commits, see `on_commit`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB)"
+        )
+        self._depth = 0
+        self._on_commit: List[Callable[[], None]] = []
+        self._on_rollback: List[Callable[[], None]] = []
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Group writes into one atomic commit, nested calls join the outer one"""
+        if self._depth:
+            self._depth += 1
+            try:
+                yield self.conn
+            finally:
+                self._depth -= 1
+            return
+        self._depth = 1
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+            self.conn.execute("COMMIT")
+        except BaseException:
+            # a failed COMMIT leaves the transaction open, roll it back too
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            self._depth = 0
+            self._on_commit.clear()
+            for callback in reversed(self._on_rollback):
+                self._run(callback)
+            self._on_rollback.clear()
+            raise
+        self._depth = 0
+        self._on_rollback.clear()
+        callbacks, self._on_commit = self._on_commit, []
+        for callback in callbacks:
+            self._run(callback)
+
+    def on_commit(
+        self,
+        callback: Callable[[], None],
+        rollback: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        Run callback once the current transaction commits
+
+        Memory that mirrors the database is only updated through here, so a
+        rolled back transaction leaves it untouched. Outside of a transaction
+        the write already committed and callback runs right away.
+
+        Parameters
+        ----------
+        callback: Callable[[], None] - applied after COMMIT
+        rollback: Optional[Callable[[], None]] - applied after ROLLBACK instead
+        """
+        if not self._depth:
+            callback()
+            return
+        self._on_commit.append(callback)
+        if rollback is not None:
+            self._on_rollback.append(rollback)
+
+    @staticmethod
+    def _run(callback: Callable[[], None]) -> None:
+        # the database is already settled, one failing callback must not
+        # keep the others from running
+        try:
+            callback()
+        except Exception as e:
+            log.exception("Transaction callback failed: {}", e)
+
+    def store(self, table: str) -> "SQLiteStore":
+        return SQLiteStore(self, table)
+
+    def item_store(self, table: str) -> "SQLiteItemStore":
+        return SQLiteItemStore(self, table)
+
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return default if row is None else orjson.loads(row[0])
+
+    def set_meta(self, key: str, value: Any) -> None:
+        self.conn.execute(
+            (
+                "INSERT INTO meta (key, value) VALUES (?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value"
+            ),
+            (key, orjson.dumps(value, option=_DUMP_OPTION)),
+        )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class SQLiteStore:
+    """`Config` compatible store, one row per key."""
+
+    def __init__(self, database: SQLiteDatabase, table: str):
+        self.database = database
+        self.table = table
+        self.database.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table}"
+            " (key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+        )
+        self._db: Dict[str, Any] = {}
+        self.bytes_read = 0  # loaded from disk
+        self.bytes_written = 0
+        for k, v in self.database.conn.execute(f"SELECT key, value FROM {table}"):
+            self._db[k] = orjson.loads(v)
+            self.bytes_read += len(v)
+
+    def __contains__(self, key: Any) -> bool:
+        return str(key) in self._db
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._db[str(key)]
+
+    def __len__(self) -> int:
+        return len(self._db)
+
+    def get(self, key: Any, *args: Any) -> Any:
+        return self._db.get(str(key), *args)
+
+    def all(self) -> Dict[str, Any]:
+        return self._db
+
+    async def put(self, key: Any, value: Any) -> None:
+        self._write(str(key), value)
+        self.database.on_commit(partial(self._db.__setitem__, str(key), value))
+
+    async def put_many(self, values: Dict[Any, Any]) -> None:
+        """Upsert several keys in one transaction"""
+        values = {str(k): v for k, v in values.items()}
+        with self.database.transaction():
+            for key, value in values.items():
+                self._write(key, value)
+        self.database.on_commit(partial(self._db.update, values))
+
+    async def remove(self, key: Any) -> None:
+        self._delete(str(key))
+        self.database.on_commit(partial(self._db.pop, str(key), None))
+
+    def _write(self, key: str, value: Any) -> None:
+        dumped = orjson.dumps(value, option=_DUMP_OPTION)
+        self.bytes_written += len(dumped)
+        self.database.conn.execute(
+            (
+                f"INSERT INTO {self.table} (key, value) VALUES (?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET value = excluded.value"
+            ),
+            (key, dumped),
+        )
+
+    def _delete(self, key: str) -> None:
+        self.database.conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+
+class SQLiteItemStore(SQLiteStore):
+    """
+    `Config` compatible inventory store, one row per item
+
+    Values are `{item_id: item}` dicts per owner, a `put` diffs against the
+    rows already on disk and only upserts or deletes the items that changed.
+    """
+
+    def __init__(self, database: SQLiteDatabase, table: str):
+        self.database = database
+        self.table = table
+        self.database.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (owner TEXT NOT NULL,"
+            " item_id TEXT NOT NULL, value BLOB NOT NULL,"
+            " PRIMARY KEY (owner, item_id))"
+        )
+        self._db: Dict[str, Dict[str, Any]] = {}
+        self._rows: Dict[str, Dict[str, bytes]] = {}  # committed rows
+        self._staged: Dict[str, Dict[str, bytes]] = {}  # rows of open transactions
+        self.bytes_read = 0
+        self.bytes_written = 0
+        for owner, item_id, value in self.database.conn.execute(
+            f"SELECT owner, item_id, value FROM {table}"
+        ):
+            self._db.setdefault(owner, {})[item_id] = orjson.loads(value)
+            self._rows.setdefault(owner, {})[item_id] = value
+            self.bytes_read += len(value)
+
+    def _write(self, key: str, value: Dict[str, Any]) -> None:
+        old = self._staged.get(key, None)
+        if old is None:
+            old = self._rows.get(key, {})
+        rows, changed = {}, []
+        for item_id, item in value.items():
+            dumped = orjson.dumps(item, option=_DUMP_OPTION)
+            rows[item_id] = dumped
+            if old.get(item_id) != dumped:
+                changed.append((key, item_id, dumped))
+                self.bytes_written += len(dumped)
+        removed = [(key, item_id) for item_id in old.keys() - value.keys()]
+
+        conn = self.database.conn
+        if changed:
+            conn.executemany(
+                (
+                    f"INSERT INTO {self.table} (owner, item_id, value) VALUES (?, ?, ?)"
+                    " ON CONFLICT(owner, item_id) DO UPDATE SET value = excluded.value"
+                ),
+                changed,
+            )
+        if removed:
+            conn.executemany(
+                f"DELETE FROM {self.table} WHERE owner = ? AND item_id = ?", removed
+            )
+        self._stage(key, rows)
+
+    def _delete(self, key: str) -> None:
+        self.database.conn.execute(f"DELETE FROM {self.table} WHERE owner = ?", (key,))
+        self._stage(key, {})
+
+    def _stage(self, key: str, rows: Dict[str, bytes]) -> None:
+        """Diff later writes of key against rows until the transaction ends"""
+        self._staged[key] = rows
+        self.database.on_commit(
+            partial(self._commit_rows, key), partial(self._staged.pop, key, None)
+        )
+
+    def _commit_rows(self, key: str) -> None:
+        rows = self._staged.pop(key, None)
+        if rows:
+            self._rows[key] = rows
+        elif rows is not None:
+            self._rows.pop(key, None)
+
+
+def migrate_json(
+    database: SQLiteDatabase, sources: List[Tuple[SQLiteStore, str]]
+) -> bool:
+    """
+    One-shot import of the old `Config` json files
+
+    Parameters
+    ----------
+    database: SQLiteDatabase - target database
+    sources: List[Tuple[SQLiteStore, str]] - store and the json file it replaces
+
+    Returns
+    -------
+    bool - True if anything was migrated, False if already done or no files
+    """
+    if database.get_meta("migrated_json", False):
+        return False
+    migrated = False
+    with database.transaction():
+        for store, path in sources:
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                data: dict = orjson.loads(f.read())
+            for key, value in data.items():
+                store._write(str(key), value)
+                database.on_commit(partial(store._db.__setitem__, str(key), value))
+            log.info("Migrated {} rows from {} into {}.", len(data), path, store.table)
+            migrated = True
+        database.set_meta("migrated_json", True)
+    return migrated
+
+
+def migrate_item_templates(
+    database: SQLiteDatabase, store: SQLiteItemStore, catalog: ItemCatalog
+) -> int:
+    """
+    One-shot rewrite of legacy full item records into template records
+
+    Items stored before the catalog keep a full copy of their template, the
+    ones that still match it are rewritten as `template` plus their own
+    deltas, anything else is left as a full record.
+
+    Parameters
+    ----------
+    database: SQLiteDatabase - database holding the store
+    store: SQLiteItemStore - inventory store
+    catalog: ItemCatalog - templates to match the records against
+
+    Returns
+    -------
+    int - number of items rewritten, 0 if already done
+    """
+    if database.get_meta("migrated_item_templates", False):
+        return 0
+    migrated = 0
+    with database.transaction():
+        for owner, inventory in store.all().items():
+            changed = {}
+            for item_id, record in inventory.items():
+                if record.get("template", ""):
+                    continue
+                key = catalog.match(record)
+                if key is not None:
+                    changed[item_id] = catalog.load(
+                        {**record, "template": key}
+                    ).__dict__()
+            if changed:
+                value = {**inventory, **changed}
+                store._write(owner, value)
+                database.on_commit(partial(store._db.__setitem__, owner, value))
+                migrated += len(changed)
+        database.set_meta("migrated_item_templates", True)
+    log.info(
+        "Rewrote {} legacy items in {} as template records.", migrated, store.table
+    )
+    return migrated
@@ -7,7 +7,7 @@ from loguru import logger as log
 
 from maki.cogs.utils.view import Confirm
 
-from ..lib import DEV, Guild, Item
+from ..lib import Guild
 from ..utils import board_view, info_view, stamp_footer
 
 
@@ -24,7 +24,7 @@ class DungeonAppCommandsMixin:
         except Exception as e:
             log.error(e)
 
-        result = await base.wait()
+        result = await self.wait_view(interaction, base)
 
         if base.value == "statsrecord":
             await self.statsrec_view(
@@ -81,7 +81,7 @@ class DungeonAppCommandsMixin:
 
         if subject == "set_status":
             player.status = content
-            await self.set_user(interaction.user.id)
+            await self.set_user(interaction.user.id, player)
             return await interaction.response.send_message(
                 embed=discord.Embed(
                     description="個人狀態已更改為: `{}`".format(content),
@@ -101,7 +101,7 @@ class DungeonAppCommandsMixin:
                     ephemeral=True,
                 )
             player.colour = colour
-            await self.set_user(interaction.user.id)
+            await self.set_user(interaction.user.id, player)
             return await interaction.response.send_message(
                 embed=discord.Embed(
                     description="個人顏色已更改",
@@ -210,14 +210,14 @@ class DungeonAppCommandsMixin:
 
     @app_commands.command(name="backpack", description="查看物品欄位")
     async def player_inventoy(self, interaction: discord.Interaction):
-        inventory_embeds = await self.build_inventory_embeds(interaction)
         await interaction.response.defer(thinking=True)
-        await self.inven_view(interaction, inventory_embeds)
+        await self.inven_view(interaction)
 
     @app_commands.command(name="transfer", description="轉贈物品於其他玩家")
     @app_commands.rename(item_id="物品", user="玩家")
     @app_commands.describe(
-        item_id="請輸入物品代碼，可以從/backpack 找到物品代碼", user="請選擇玩家"
+        item_id="請輸入物品代碼，可以從/backpack 找到物品代碼，多個物品以空白分隔",
+        user="請選擇玩家",
     )
     async def transfer_item(
         self,
@@ -225,56 +225,7 @@ class DungeonAppCommandsMixin:
         item_id: str,
         user: discord.User,
     ):
-        # await interaction.response.defer(thinking=True)
-        result: Item = self.get_user_item(interaction.user, item_id)  # type: ignore
-        player = await self.get_player(interaction.user)
-        target_player = await self.get_player(user)
-        if player.level < 5 or target_player.level < 5:
-            await interaction.response.send_message(
-                embed=discord.Embed(
-                    description="雙方需要5等才能轉贈物品",
-                    colour=discord.Colour.red(),
-                ),
-                ephemeral=True,
-            )
-            return
-        if not result:
-            await interaction.response.send_message(
-                embed=discord.Embed(
-                    description="物品轉贈失敗，請確認物品代碼是否正確",
-                    colour=discord.Colour.red(),
-                ),
-                ephemeral=True,
-            )
-            return
-        if self.in_player_equips(player, item_id):
-            await interaction.response.send_message(
-                embed=discord.Embed(
-                    description="物品轉贈失敗，裝備目前使用中",
-                    colour=discord.Colour.red(),
-                ),
-                ephemeral=True,
-            )
-            return
-        if len(target_player.inventory) >= target_player.allowed_inventory:
-            await interaction.response.send_message(
-                embed=discord.Embed(
-                    description="物品轉贈失敗，對方物品欄位已滿",
-                    colour=discord.Colour.red(),
-                ),
-                ephemeral=True,
-            )
-            return
-        if result.set in ["Behemoth", "Leviathan", "Tiamat"]:
-            await interaction.response.send_message(
-                embed=discord.Embed(
-                    description="物品轉贈失敗，傳說物品無法被轉贈",
-                    colour=discord.Colour.red(),
-                ),
-                ephemeral=True,
-            )
-            return
-        if interaction.user.id in self.char_raid_lock or user.id in self.char_raid_lock:
+        if self.check_in_raid(interaction.user.id) or self.check_in_raid(user.id):
             await interaction.response.send_message(
                 embed=discord.Embed(
                     description="物品轉贈失敗，請等待雙方副本結束",
@@ -283,11 +234,37 @@ class DungeonAppCommandsMixin:
                 ephemeral=True,
             )
             return
-        await self.remove_item(interaction.user, item_id)
-        await self.give_item(user, result)
+        async with self.lock_users(interaction.user, user):
+            player = await self.get_player(interaction.user)
+            target_player = await self.get_player(user)
+            if player.level < 5 or target_player.level < 5:
+                await interaction.response.send_message(
+                    embed=discord.Embed(
+                        description="雙方需要5等才能轉贈物品",
+                        colour=discord.Colour.red(),
+                    ),
+                    ephemeral=True,
+                )
+                return
+            try:
+                items = await self.transfer_items(
+                    interaction.user.id, user.id, item_id.replace(",", " ").split()
+                )
+            except ValueError as e:
+                await interaction.response.send_message(
+                    embed=discord.Embed(
+                        description=str(e),
+                        colour=discord.Colour.red(),
+                    ),
+                    ephemeral=True,
+                )
+                return
         await interaction.response.send_message(
             embed=discord.Embed(
-                description=f"物品轉贈成功，{user.mention}已獲得{result.name}",
+                description=(
+                    f"物品轉贈成功，{user.mention}已獲得"
+                    + "、".join(item.name for item in items)
+                ),
                 colour=discord.Colour.green(),
             )
         )
@@ -303,63 +280,64 @@ class DungeonAppCommandsMixin:
                 ephemeral=True,
             )
             return
-        player = await self.get_player(interaction.user)
-        if player.level < 5:
-            await interaction.response.send_message(
-                embed=discord.Embed(
-                    description="需要5等才能開啟補給箱",
-                    colour=discord.Colour.red(),
-                ),
-                ephemeral=True,
-            )
-            return
-        if player.chest < 20:
-            await interaction.response.send_message(
-                embed=discord.Embed(
-                    description="還沒有獲得補給箱喔，試著多多參加討伐吧！",
-                    colour=discord.Colour.red(),
-                ),
-                ephemeral=True,
-            )
-            return
-        if player.allowed_inventory <= len(player.inventory):
-            await interaction.response.send_message(
-                embed=discord.Embed(
-                    description="物品欄位已滿，請先清理物品欄位",
-                    colour=discord.Colour.red(),
-                ),
-                ephemeral=True,
-            )
-            return
-        player.chest -= 20
-        await self.set_player(interaction.user, player)
-        if 0.05 > random.random():
-            player.soulshard += 1
+        async with self.lock_users(interaction.user):
+            player = await self.get_player(interaction.user)
+            if player.level < 5:
+                await interaction.response.send_message(
+                    embed=discord.Embed(
+                        description="需要5等才能開啟補給箱",
+                        colour=discord.Colour.red(),
+                    ),
+                    ephemeral=True,
+                )
+                return
+            if player.chest < 20:
+                await interaction.response.send_message(
+                    embed=discord.Embed(
+                        description="還沒有獲得補給箱喔，試著多多參加討伐吧！",
+                        colour=discord.Colour.red(),
+                    ),
+                    ephemeral=True,
+                )
+                return
+            if player.allowed_inventory <= len(player.inventory):
+                await interaction.response.send_message(
+                    embed=discord.Embed(
+                        description="物品欄位已滿，請先清理物品欄位",
+                        colour=discord.Colour.red(),
+                    ),
+                    ephemeral=True,
+                )
+                return
+            player.chest -= 20
             await self.set_player(interaction.user, player)
-            embed = discord.Embed(
-                description="開啟補給箱後發現了一片靈魂碎片",
-                colour=discord.Colour.dark_purple(),
-            )
-            embed.set_footer(text=f"剩餘補給箱數量: {player.chest/20:.0f}")
-            await interaction.response.send_message(embed=embed)
-        else:
-            if interaction.guild is None:
-                item = self.create_item(
-                    random.choice(list(self.item.values())), min(player.level, 10)
+            if 0.05 > random.random():
+                player.soulstone += 1
+                await self.set_player(interaction.user, player)
+                embed = discord.Embed(
+                    description="開啟補給箱後發現了一片靈魂碎片",
+                    colour=discord.Colour.dark_purple(),
                 )
+                embed.set_footer(text=f"剩餘補給箱數量: {player.chest/20:.0f}")
+                await interaction.response.send_message(embed=embed)
             else:
-                world = await self.get_world(interaction.guild)
-                item = self.create_item(
-                    random.choice(list(self.item.values())),
-                    min(player.level, world.level * 10),
+                if interaction.guild is None:
+                    item = self.create_item(
+                        random.choice(list(self.item.values())), min(player.level, 10)
+                    )
+                else:
+                    world = await self.get_world(interaction.guild)
+                    item = self.create_item(
+                        random.choice(list(self.item.values())),
+                        min(player.level, world.level * 10),
+                    )
+                item_id = await self.give_item(interaction.user.id, item)
+                embed = discord.Embed(
+                    description=f"補給箱已開啟，獲得{item.name}\n代碼: {item_id}",
+                    colour=discord.Colour.green(),
                 )
-            item_id = await self.give_item(interaction.user, item)
-            embed = discord.Embed(
-                description=f"補給箱已開啟，獲得{item.name}\n代碼: {item_id}",
-                colour=discord.Colour.green(),
-            )
-            embed.set_footer(text=f"剩餘補給箱數量：{int(player.chest/20):.0f}")
-            await interaction.response.send_message(embed=embed)
+                embed.set_footer(text=f"剩餘補給箱數量：{int(player.chest/20):.0f}")
+                await interaction.response.send_message(embed=embed)
 
     @app_commands.command(name="reinforce", description="強化裝備")
     @app_commands.rename(item_id="物品")
@@ -375,7 +353,7 @@ class DungeonAppCommandsMixin:
             )
             return
         player = await self.get_player(interaction.user)
-        if player.soulshard < 1:
+        if player.soulstone < 1:
             await interaction.response.send_message(
                 embed=discord.Embed(
                     description="靈魂碎片不足，請在獲得碎片後再回來。",
@@ -384,7 +362,7 @@ class DungeonAppCommandsMixin:
                 ephemeral=True,
             )
             return
-        item = self.get_user_item(interaction.user, item_id)
+        item = self.get_user_item(interaction.user.id, item_id)
         if item is None:
             await interaction.response.send_message(
                 embed=discord.Embed(
@@ -402,7 +380,7 @@ class DungeonAppCommandsMixin:
             ),
             view=confirm,
         )
-        await confirm.wait()
+        await self.wait_view(interaction, confirm)
         if not confirm.value:
             await interaction.edit_original_response(
                 embed=discord.Embed(
@@ -421,10 +399,22 @@ class DungeonAppCommandsMixin:
             )
             log.info(f"{interaction.user} is in raid, while trying to reinforce item.")
             return
-        # else
-        result = await self.reinforce_item(interaction.user, item_id)
+        async with self.lock_users(interaction.user):
+            player = await self.get_player(interaction.user)
+            if player.soulstone < 1 or not self.ownership.owns(
+                interaction.user.id, item_id
+            ):
+                await interaction.edit_original_response(
+                    embed=discord.Embed(
+                        description="強化失敗，靈魂碎片不足或物品已不存在",
+                        colour=discord.Colour.red(),
+                    ),
+                    view=None,
+                )
+                return
+            result = await self.reinforce_item(interaction.user, item_id)
 
-        item = self.get_user_item(interaction.user, item_id)
+        item = self.get_user_item(interaction.user.id, item_id)
 
         if result is None:
             await interaction.edit_original_response(
@@ -467,10 +457,11 @@ class DungeonAppCommandsMixin:
             ),
             view=view,
         )
-        await view.wait()
+        await self.wait_view(interaction, view)
         if view.value:
             await self.user_data.remove(interaction.user.id)
             await self.user_inventory.remove(interaction.user.id)
+            self.equipment_cache.invalidate(str(interaction.user.id))
             await interaction.edit_original_response(
                 embed=discord.Embed(description="資料已清除", color=self.bot.color),
                 view=None,
@@ -483,19 +474,8 @@ class DungeonAppCommandsMixin:
 
     @app_commands.command(name="leaderboard", description="排行榜")
     async def _leaderboard(self, interaction: discord.Interaction):
-        data = self.user_data.all()
-        data = {
-            k: v
-            for k, v in sorted(
-                data.items(),
-                key=lambda d: (d[1]["rebirth"], d[1]["level"], d[1]["exp"]),
-                reverse=True,
-            )
-            if int(k) not in DEV
-        }
-        data = {k: data[k] for k in list(data)[:50]}
         player_list = []
-        for i, (k, v) in enumerate(data.items(), start=1):
+        for rank, k, v in self.leaderboard.top(50):
             p_info = {}
             user = self.bot.get_user(int(k))
             name = f"{user.name}#{user.discriminator}" if user else "Unknown User"
@@ -503,13 +483,16 @@ class DungeonAppCommandsMixin:
             p_info["rebirth"] = v["rebirth"]
             p_info["level"] = v["level"]
             p_info["uuid"] = k
-            p_info["rank"] = i
+            p_info["rank"] = rank
             p_info["exp"] = v["exp"]
             player_list.append(p_info)
+        own_rank = self.leaderboard.rank(interaction.user.id)
         leaderboard_embeds = []
         for _ in range(0, 50, 5):
             leaderboard_embed = discord.Embed(
-                title="Dungeon 排行榜", colour=self.bot.color
+                title="Dungeon 排行榜",
+                description=f"你的排名: No. {own_rank:03d}" if own_rank else None,
+                colour=self.bot.color,
             )
             leaderboard_embed.set_thumbnail(url=self.bot.user.avatar.url)
             for player in player_list[_ : _ + 5]:  # noqa: E203
@@ -521,7 +504,7 @@ class DungeonAppCommandsMixin:
                     ),
                     inline=False,
                 )
-            stamp_footer(leaderboard_embed)
+            stamp_footer(self, leaderboard_embed)
             leaderboard_embeds.append(leaderboard_embed)
 
         lb_view = board_view(interaction.user, leaderboard_embeds)
@@ -529,7 +512,7 @@ class DungeonAppCommandsMixin:
             embed=leaderboard_embeds[0], view=lb_view
         )
 
-        result = await lb_view.wait()
+        result = await self.wait_view(interaction, lb_view)
         if lb_view.index == "close":
             await interaction.delete_original_response()
         elif isinstance(result, bool):
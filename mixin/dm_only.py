@@ -3,7 +3,7 @@ from discord.ext import commands
 
 from maki.cogs.utils.view import Confirm
 
-from ..lib import Job
+from ..lib import STAT_ALIASES, Job
 from ..utils.view import job_advancement
 
 
@@ -29,8 +29,12 @@ class DungeonPrivateCommands:
         )
         await confirm.wait()
         if confirm.value:
-            player.reset_ability_points()
-            await self.set_player(ctx.author, player)
+            async with self.lock_users(ctx.author):
+                player = await self.get_player(ctx.author)
+                if player.level < 10:
+                    return await ctx.send("超過10等才能使用此功能。")
+                player.reset_ability_points()
+                await self.set_player(ctx.author, player)
             await ctx.send("重置配點成功！")
         else:
             await ctx.send("取消重置配點。")
@@ -94,24 +98,19 @@ class DungeonPrivateCommands:
             await ctx.send("配點不能小於1。")
             return
         pts = min(max(pts, 0), 100)
-        player = await self.get_player(ctx.author)
-        if pts > player.remain_stats:
-            await ctx.send("你沒有足夠的配點點數，請確認你的輸入是否正確。")
-            return
-        if stat not in ["力量", "敏捷", "智慧", "體質", "str", "dex", "con", "wis"]:
+        if stat not in STAT_ALIASES:
             await ctx.send("請輸入正確的配點項目。")
             return
-        if stat in ["str", "力量"]:
-            player.stats.str += pts
-        elif stat in ["dex", "敏捷"]:
-            player.stats.dex += pts
-        elif stat in ["con", "體質"]:
-            player.stats.con += pts
-        elif stat in ["wis", "智慧"]:
-            player.stats.wis += pts
-        player.remain_stats -= pts
+        async with self.lock_users(ctx.author):
+            player = await self.get_player(ctx.author)
+            if pts > player.remain_stat:
+                await ctx.send("你沒有足夠的配點點數，請確認你的輸入是否正確。")
+                return
+            attr = STAT_ALIASES[stat]
+            setattr(player, attr, getattr(player, attr) + pts)
+            player.remain_stat -= pts
 
-        await self.set_player(ctx.author, player)
+            await self.set_player(ctx.author, player)
         await ctx.send(f"配點成功！你的{stat}增加了{pts}點。")
 
     # @commands.command(name="soulforge", aliases=["靈魂轉換"])
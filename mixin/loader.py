@@ -3,7 +3,7 @@ import pathlib
 import orjson
 from loguru import logger as log
 
-from ..lib import Item, Job, MonsterInfo
+from ..lib import Item, ItemCatalog, Job, MonsterInfo
 
 datapath = pathlib.Path(__file__).parent.parent.resolve() / "data"
 
@@ -35,6 +35,7 @@ class DungeonLoaderMixin:
             items_data: dict = orjson.loads(f.read())
         for name in items_data.keys():
             self.item[name] = Item(data=items_data[name])
+        self.catalog = ItemCatalog(self.item)
         log.info("Loaded {} items.", len(self.item))
 
     def load_monsterinfo(self) -> None:
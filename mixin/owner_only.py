@@ -1,7 +1,12 @@
-from discord import Colour, Embed
+import io
+
+from typing import List
+
+from discord import Colour, Embed, File, User
 from discord.ext import commands
 from loguru import logger as log
 
+from ..lib import COMBAT_LOG_GZIP, format_table, pack_log, replay, snapshot
 from ..utils import get_embed
 
 
@@ -10,7 +15,10 @@ class DungeonOwnerCommandsMixin:
     @commands.group(name="dungeon", hidden=True, invoke_without_command=True)
     @commands.is_owner()
     async def _dungeon(self, ctx: commands.Context) -> None:
-        await ctx.send("缺少參數, `list`, `lock` 或是 `unlock`。")
+        await ctx.send(
+            "缺少參數, `list`, `lock`, `unlock`, `cache`, `locks`, `item`,"
+            " `scrub`, `metrics`, `replay` 或是 `simulate`。"
+        )
         pass
 
     @_dungeon.command(name="lock", aliases=["unlock"])
@@ -33,13 +41,145 @@ class DungeonOwnerCommandsMixin:
     @_dungeon.command(name="list")
     async def _list_instance(self, ctx: commands.Context) -> None:
         """顯示目前開啟的副本入口。"""
-        if self.occupied_guild:
+        if self.raids:
             content = "\n".join(
-                f"{self.bot.get_guild(k)}: <t:{v[1]}:R>"
-                for k, v in self.occupied_guild.items()[:10]
+                f"{self.bot.get_guild(k)}: {v.phase.value} <t:{v.deadline}:R>"
+                for k, v in list(self.raids.items())[:10]
             )
-            if len(self.occupied_guild) > 10:
+            if len(self.raids) > 10:
                 content += "\n..."
+            content += f"\n排程: {len(self.scheduler)} | 已觸發: {self.scheduler.fired}"
             await ctx.send(f"副本列表:\n{content}")
         else:
             await ctx.send("沒有開啟的副本。")
+
+    @_dungeon.command(name="cache")
+    async def _cache_stats(self, ctx: commands.Context) -> None:
+        """顯示各快取的命中率。"""
+        content = "\n".join(
+            f"[{name}] " + ", ".join(f"{k}: {v}" for k, v in cache.stats().items())
+            for name, cache in self.caches.items()
+        )
+        await ctx.send(f"快取:\n```\n{content}\n```")
+
+    @_dungeon.command(name="locks")
+    async def _lock_stats(self, ctx: commands.Context) -> None:
+        """顯示副本鎖與玩家鎖的狀態。"""
+        lines = []
+        for manager in (self.world_raid_lock, self.char_raid_lock):
+            stats = ", ".join(f"{k}: {v}" for k, v in manager.stats().items())
+            lines.append(f"[{manager.name}] {stats}")
+            for key, lease in manager.items()[:10]:
+                lines.append(f"  {key} -> {lease.holder} ({lease.expires:.0f})")
+        stats = ", ".join(f"{k}: {v}" for k, v in self.user_locks.stats().items())
+        lines.append(f"[{self.user_locks.name}] {stats}")
+        content = "\n".join(lines)
+        await ctx.send(f"副本鎖:\n```\n{content}\n```")
+
+    @_dungeon.command(name="item")
+    async def _item_owner(self, ctx: commands.Context, item_id: str) -> None:
+        """查詢物品的擁有者。"""
+        owner = self.ownership.owner(item_id)
+        if owner is None:
+            await ctx.send(
+                f"找不到物品 `{item_id}`。\n已索引物品: {len(self.ownership):,}"
+                f" | 重複物品: {len(self.ownership.duplicates):,}"
+            )
+            return
+        item = self.get_user_item(owner.owner, item_id)
+        content = "\n".join(
+            [
+                f"擁有者: {self.bot.get_user(int(owner.owner))} ({owner.owner})",
+                f"物品: {item.name if item else '-'} | 模板: {owner.template or '-'}",
+                f"裝備欄位: {owner.slot or '-'}",
+            ]
+        )
+        if item_id in self.ownership.duplicates:
+            content += "\n重複擁有者: " + ", ".join(
+                sorted(self.ownership.duplicates[item_id])
+            )
+        await ctx.send(f"```\n{content}\n```")
+
+    @_dungeon.command(name="scrub")
+    async def _scrub_stats(self, ctx: commands.Context, run: bool = False) -> None:
+        """顯示資料一致性檢查的進度，`run` 立即檢查下一批玩家。"""
+        if run:
+            await self.scrub()
+        lines = [", ".join(f"{k}: {v}" for k, v in self.scrubber.stats().items())]
+        lines.extend(
+            f"{'+' if issue.repaired else '!'} {issue.user_id} {issue.kind}:"
+            f" {issue.detail}"
+            for issue in list(self.scrubber.issues)[-10:]
+        )
+        content = "\n".join(lines)
+        await ctx.send(f"資料檢查:\n```\n{content}\n```")
+
+    @_dungeon.command(name="metrics")
+    async def _metrics(self, ctx: commands.Context, dump: bool = False) -> None:
+        """顯示指令延遲與存取統計，`dump` 立即寫出 Prometheus 檔案。"""
+        if dump:
+            await self.dump_metrics()
+        stores = "\n".join(
+            f"[{name}] " + ", ".join(f"{k}: {v:,}" for k, v in stats.items())
+            for name, stats in self.store_stats().items()
+        )
+        content = format_table(self.metrics.summary(), limit=15) + "\n\n" + stores
+        await ctx.send(f"指令統計:\n```\n{content}\n```")
+
+    @_dungeon.command(name="replay")
+    async def _replay_raid(self, ctx: commands.Context, raid_id: str) -> None:
+        """以目前的戰鬥規則重播副本紀錄。"""
+        record = self.raid_data.get(raid_id, None)
+        if record is None:
+            await ctx.send("找不到這場討伐的紀錄。")
+            return
+        combat = replay(record)
+        content = (
+            f"Raid: {raid_id} | Seed: {record['seed']} | Round: {combat.rounds}"
+            f" | {'Win' if combat.won else 'Lose'}"
+            f" | Damage: {combat.total_damage:,}/{combat.monster_max_health:,}"
+        )
+        data, filename = pack_log(
+            combat.render_log(record["names"]), "replay.log", COMBAT_LOG_GZIP
+        )
+        await ctx.send(content, file=File(io.BytesIO(data), filename=filename))
+
+    @_dungeon.command(name="simulate")
+    async def _simulate_raids(
+        self,
+        ctx: commands.Context,
+        spawn_level: int,
+        runs: int = 1000,
+        users: commands.Greedy[User] = None,
+    ) -> None:
+        """以目前的角色模擬大量討伐, 需要安裝 numpy。"""
+        try:
+            from ..lib.montecarlo import simulate_batch
+        except ImportError:
+            await ctx.send("模擬器需要安裝 `numpy`。")
+            return
+        party: List[dict] = []
+        for user in users or [ctx.author]:
+            if self.user_data.get(str(user.id), None) is None:
+                await ctx.send(f"{user} 沒有角色。")
+                return
+            player = await self.get_user(user.id, False)
+            party.append(snapshot(player))
+        report = await self.bot.loop.run_in_executor(
+            None, simulate_batch, party, spawn_level, runs
+        )
+        rounds = sorted(report.rounds.items(), key=lambda x: x[1], reverse=True)[:5]
+        content = "\n".join(
+            [
+                (
+                    f"Lv. {spawn_level} x {runs:,} | 勝率: {report.win_rate:.2%}"
+                    f" | 平均回合: {report.mean_rounds:.2f}"
+                ),
+                "回合分佈: " + ", ".join(f"{k}: {v:,}" for k, v in rounds),
+                "傷害占比: "
+                + ", ".join(f"{k}: {v:.1%}" for k, v in report.damage_share.items()),
+            ]
+        )
+        if report.unfinished:
+            content += f"\n未結束: {report.unfinished:,}"
+        await ctx.send(f"```\n{content}\n```")
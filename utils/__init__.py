@@ -5,6 +5,7 @@ from .captcha import captcha
 from .format import get_embed, intword, stamp_footer
 from .view import (
     board_view,
+    combat_log_view,
     dungeon_view,
     equip_view,
     info_view,
@@ -1,5 +1,5 @@
 # Encoding: UTF-8
-import datetime
+from datetime import datetime
 
 import discord
 
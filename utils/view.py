@@ -1,10 +1,14 @@
+import io
 import random
 import time
+from typing import Callable, Dict, List, Optional, Tuple
 
-from discord import ButtonStyle, Interaction, Message, SelectOption, User
+from discord import ButtonStyle, Embed, File, Interaction, Message, SelectOption, User
 from discord.ui import Item, Select, View, button, select
 from loguru import logger as log
 
+PAGE_SIZE = 25  # options a select menu can hold
+
 
 class info_view(View):
     def __init__(self, author: User):
@@ -117,13 +121,59 @@ class stats_view(View):
 
 
 class inventory_view(View):
-    def __init__(self, author: User, embeds: dict):
+    """
+    Backpack browser that only renders the page on screen
+
+    `render(item_id, index)` builds the embed of one item, index is its
+    1-based position in the backpack. A select menu holds at most 25 options
+    so the backpack is split into pages of `PAGE_SIZE` items.
+    """
+
+    def __init__(
+        self,
+        author: User,
+        item_ids: List[str],
+        render: Callable[[str, int], Embed],
+        page: int = 0,
+        selection: Optional[str] = None,
+    ):
         super().__init__(timeout=60)
         self.value: str = ""
         self.author = author
-        self.embeds = embeds
-        self.selection = str(list(embeds.keys())[0])
-        self.dropdown = self.add_item(inventory_dropdown(self.embeds))
+        self.item_ids = item_ids
+        self.render = render
+        self.pages = max((len(item_ids) - 1) // PAGE_SIZE + 1, 1)
+        self.page = min(max(page, 0), self.pages - 1)
+        if selection in item_ids:
+            self.page = item_ids.index(selection) // PAGE_SIZE
+        self.embeds: Dict[str, Embed] = {}
+        self.selection = selection
+        self.dropdown: Optional[inventory_dropdown] = None
+        self.set_page(self.page)
+
+    @property
+    def current(self) -> Embed:
+        return self.embeds[self.selection]
+
+    def set_page(self, page: int) -> None:
+        """Render the items of one page, keeps the selection if it's on it"""
+        self.page = page
+        start = page * PAGE_SIZE
+        self.embeds = {
+            item_id: self.render(item_id, index)
+            for index, item_id in enumerate(
+                self.item_ids[start : start + PAGE_SIZE], start=start + 1
+            )
+        }
+        if self.selection not in self.embeds:
+            self.selection = next(iter(self.embeds))
+        if self.dropdown is not None:
+            self.remove_item(self.dropdown)
+        self.dropdown = inventory_dropdown(self.embeds, self.selection)
+        self.add_item(self.dropdown)
+        self.prev_page.disabled = page == 0
+        self.next_page.disabled = page >= self.pages - 1
+        self.page_count.label = f"{page + 1}/{self.pages}"
 
     @button(label="裝備/解除", row=1, style=ButtonStyle.blurple)
     async def equip(self, interaction: Interaction, button: button):
@@ -137,6 +187,22 @@ class inventory_view(View):
         self.value = "drop"
         self.stop()
 
+    @button(label="◀️", row=2, style=ButtonStyle.grey)
+    async def prev_page(self, interaction: Interaction, button: button):
+        await interaction.response.defer()
+        self.set_page(max(self.page - 1, 0))
+        await interaction.edit_original_response(embed=self.current, view=self)
+
+    @button(label="1/1", row=2, style=ButtonStyle.grey, disabled=True)
+    async def page_count(self, interaction: Interaction, button: button):
+        pass
+
+    @button(label="▶️", row=2, style=ButtonStyle.grey)
+    async def next_page(self, interaction: Interaction, button: button):
+        await interaction.response.defer()
+        self.set_page(min(self.page + 1, self.pages - 1))
+        await interaction.edit_original_response(embed=self.current, view=self)
+
     async def interaction_check(self, interaction: Interaction) -> bool:
         if interaction.user.id == self.author.id:
             return True
@@ -147,16 +213,16 @@ class inventory_view(View):
 
 
 class inventory_dropdown(Select):
-    def __init__(self, embeds: dict):
+    def __init__(self, embeds: Dict[str, Embed], selection: str):
         self.embeds = embeds
-        self.selection = str(list(embeds.keys())[0])
         super().__init__(
             placeholder="物品欄",
             options=[
                 SelectOption(
-                    label=f"{v.title}",
-                    description=f"{v.description}",
+                    label=f"{v.title}"[:100],
+                    description=f"{v.description}"[:100],
                     value=f"{k}",
+                    default=k == selection,
                 )
                 for k, v in self.embeds.items()
             ],
@@ -165,7 +231,9 @@ class inventory_dropdown(Select):
     async def callback(self, interaction: Interaction):
         await interaction.response.defer()
         self.view.selection = self.values[0]
-        await interaction.message.edit(
+        for option in self.options:
+            option.default = option.value == self.view.selection
+        await interaction.edit_original_response(
             embed=self.embeds[self.view.selection], view=self.view
         )
 
@@ -204,6 +272,23 @@ class board_view(View):
         return False
 
 
+class combat_log_view(View):
+    def __init__(self, render: Callable[[], Tuple[bytes, str]]):
+        super().__init__(timeout=600)
+        self.render = render
+        self.file: Optional[Tuple[bytes, str]] = None
+
+    @button(label="戰鬥紀錄", style=ButtonStyle.grey)
+    async def show_log(self, interaction: Interaction, button: button):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        if self.file is None:
+            self.file = self.render()
+        data, filename = self.file
+        await interaction.followup.send(
+            file=File(io.BytesIO(data), filename=filename), ephemeral=True
+        )
+
+
 class react_chest(View):
     def __init__(self, bot, item, world_level):
         super().__init__()
@@ -217,9 +302,10 @@ class react_chest(View):
         self.redeemed.append(interaction.user.id)
         c = self.bot.get_cog("Dungeon")
         item = random.choice(list(self.item.values()))
-        player = await c.get_player(interaction.user)
-        item = c.create_item(item, min(player.level, self.level_limit))
-        await c.give_item(interaction.user, item)
+        async with c.lock_users(interaction.user):
+            player = await c.get_player(interaction.user)
+            item = c.create_item(item, min(player.level, self.level_limit))
+            await c.give_item(interaction.user.id, item)
         await interaction.response.send_message(
             f"領取成功，你獲得了{item.name}！", ephemeral=True
         )
@@ -272,6 +358,7 @@ class dungeon_view(View):
     def __init__(self, bot, preptime: int):
         self.bot = bot
         self.value: set = set()
+        self.locks: Dict[str, int] = {}  # user id -> character raid lock token
         self.start_time = int(time.time() + preptime)
         super().__init__(timeout=preptime)
 
@@ -286,15 +373,13 @@ class dungeon_view(View):
     async def join_raid(self, interaction: Interaction, button: button):
         await interaction.response.defer()
         cog = self.bot.get_cog("Dungeon")
-        if interaction.user.id in cog.char_raid_lock.keys():
-            if cog.char_raid_lock[interaction.user.id][0] == interaction.channel_id:
+        channel_id = cog.char_raid_lock.holder(interaction.user.id)
+        if channel_id is not None:
+            if channel_id == interaction.channel_id:
                 await interaction.followup.send("你已經參加了討伐。", ephemeral=True)
             else:
                 await interaction.followup.send(
-                    (
-                        "你正在戰鬥中，無法重複參加討伐\n討伐位置:"
-                        f" <#{cog.char_raid_lock[interaction.user.id][0]}>"
-                    ),
+                    f"你正在戰鬥中，無法重複參加討伐\n討伐位置: <#{channel_id}>",
                     ephemeral=True,
                 )
             message: Message = interaction.message
@@ -316,10 +401,11 @@ class dungeon_view(View):
                 self.bot._auto_spam_count.pop(author_id, None)
             return
         else:
-            cog.char_raid_lock[interaction.user.id] = [
+            self.locks[str(interaction.user.id)] = cog.char_raid_lock.acquire(
+                interaction.user.id,
                 interaction.channel_id,
-                self.start_time,
-            ]
+                self.start_time - time.time() + cog.char_raid_lock.ttl,
+            )
             await interaction.followup.send("成功參加討伐！", ephemeral=True)
         self.value.add(str(interaction.user.id))
         self.update_label()